@@ -0,0 +1,128 @@
+"""Render many stack plots in parallel using a process pool
+
+Usage:
+  from batch import batch
+  results = batch(jobs, workers=4)
+
+or, from the command line, with jobs saved using pickle.dump(jobs, f):
+  python batch.py jobs.pkl --workers 4 [--shared-memory]
+
+Each job is a dict with keys t, y, title, style, max_gap, rcParams, and file
+(all but y and file are optional), or a tuple with these elements in this
+order. Additional dict keys are passed to stackplot() as keyword arguments.
+"""
+import sys
+import time
+import pickle
+import argparse
+import traceback
+
+from concurrent.futures import ProcessPoolExecutor
+
+job_keys = ['t', 'y', 'title', 'style', 'max_gap', 'rcParams', 'file']
+
+def batch(jobs, workers=None, shared_memory=False):
+  """Render jobs in a process pool and save each figure to job['file']
+
+  If shared_memory=True, the ndarrays in t and y of each job are put in
+  shared memory and only descriptors of them are pickled to the workers;
+  jobs with views of the same array (e.g., windows of one archive) use one
+  copy of it. See shared.py. t and y may also be SharedArrays.
+
+  Returns a list with one dict per job, in the order of jobs, with keys
+    'file': the output file,
+    'time': wall time in seconds to render and save,
+    'error': None or the traceback string if the job failed.
+  A failed job does not stop the other jobs.
+  """
+  jobs = [_check_job(job) for job in jobs]
+
+  shared = None
+  if shared_memory:
+    from shared import SharedArrays
+    shared = SharedArrays()
+    jobs = [{**job, 't': shared.share_all(job.get('t')), 'y': shared.share_all(job['y'])}
+            for job in jobs]
+
+  try:
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+      results = list(pool.map(_render, jobs))
+  finally:
+    if shared is not None:
+      shared.close()
+  return results
+
+def _check_job(job):
+
+  if isinstance(job, (tuple, list)):
+    if len(job) != len(job_keys):
+      raise ValueError(f'A job tuple must have {len(job_keys)} elements: {", ".join(job_keys)}')
+    job = dict(zip(job_keys, job))
+
+  if not isinstance(job, dict):
+    raise ValueError('A job must be a dict or a tuple')
+
+  for key in ['y', 'file']:
+    if key not in job:
+      raise ValueError(f"Job is missing required key '{key}'")
+
+  return job
+
+def _init_worker():
+  """Import Matplotlib and load fonts once per worker process"""
+  import matplotlib
+  matplotlib.use('Agg')
+  from stackplot import stackplot
+  # Rendering a small figure builds the font cache and loads the fonts used.
+  stackplot([0, 1], [0, 1], returnimage='png')
+
+def _render(job):
+
+  import matplotlib
+  from stackplot import stackplot
+  from shared import resolve
+
+  kwargs = {k: v for k, v in job.items() if k not in job_keys}
+  rcParams = job.get('rcParams') or {}
+
+  start = time.perf_counter()
+  error = None
+  try:
+    with matplotlib.rc_context(rc=rcParams):
+      fig = stackplot(resolve(job.get('t')), resolve(job['y']), title=job.get('title'),
+                      style=job.get('style'), max_gap=job.get('max_gap'),
+                      returnimage=True, **kwargs)
+      fig.savefig(job['file'])
+  except Exception:
+    error = traceback.format_exc()
+
+  return {'file': job['file'], 'time': time.perf_counter() - start, 'error': error}
+
+def _cli(argv=None):
+
+  parser = argparse.ArgumentParser(description='Render stack plot jobs in parallel.')
+  parser.add_argument('jobs', help='File with list of jobs saved using pickle')
+  parser.add_argument('--workers', type=int, default=None,
+                      help='Number of worker processes (default: number of CPUs)')
+  parser.add_argument('--shared-memory', action='store_true',
+                      help='Pass arrays to workers in shared memory instead of pickling them')
+  args = parser.parse_args(argv)
+
+  with open(args.jobs, 'rb') as f:
+    jobs = pickle.load(f)
+
+  results = batch(jobs, workers=args.workers, shared_memory=args.shared_memory)
+
+  n_fail = 0
+  for result in results:
+    if result['error'] is None:
+      print(f"{result['time']:.3f} s  Wrote {result['file']}")
+    else:
+      n_fail += 1
+      print(f"{result['time']:.3f} s  Failed {result['file']}\n{result['error']}", file=sys.stderr)
+  print(f"{len(results) - n_fail} of {len(results)} jobs succeeded")
+
+  return 1 if n_fail > 0 else 0
+
+if __name__ == '__main__':
+  sys.exit(_cli())
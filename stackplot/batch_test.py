@@ -0,0 +1,40 @@
+import os
+import pickle
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from batch import batch, _cli
+
+if __name__ == '__main__':
+
+  os.makedirs('batch_test', exist_ok=True)
+
+  t = np.array([datetime(2000,1,1) + timedelta(minutes=i) for i in range(1440)])
+  y = np.cumsum(np.random.randn(2, 1440), axis=1)
+  rcParams = {'figure.figsize': (8.5, 11), 'figure.constrained_layout.use': True}
+
+  jobs = []
+  for i in range(6):
+    title = f"Job #{i}"
+    jobs.append((t, y + i, title, {}, None, rcParams, f"batch_test/batch_test_{i:02d}.png"))
+
+  # Job with extra stackplot() keyword arguments
+  jobs.append({'t': t, 'y': y, 'decimate': 'minmax', 'max_points': 100,
+               'file': "batch_test/batch_test_06.png"})
+
+  # Job that fails (len(t) != len(y)) should not stop the other jobs
+  jobs.append({'t': t[0:10], 'y': y, 'file': "batch_test/batch_test_07.png"})
+
+  results = batch(jobs, workers=2)
+  for result in results:
+    print(f"{result['time']:.3f} s {result['file']} error = {result['error'] is not None}")
+
+  assert len(results) == len(jobs)
+  assert all(result['error'] is None for result in results[0:-1])
+  assert results[-1]['error'] is not None
+  assert all(os.path.exists(job[-1]) for job in jobs[0:6])
+
+  with open('batch_test/jobs.pkl', 'wb') as f:
+    pickle.dump(jobs[0:2], f)
+  assert _cli(['batch_test/jobs.pkl', '--workers', '2']) == 0
@@ -0,0 +1,204 @@
+"""Time and memory benchmarks for stackplot() and timeseries()
+
+Usage:
+  python benchmark.py                                # Print results
+  python benchmark.py --save baseline.json           # Save results
+  python benchmark.py --compare baseline.json        # Compare with saved results
+  python benchmark.py --points 1e3 1e5 --panels 1 5  # Subset
+
+Stages timed for each number of points per panel and number of panels:
+  normalize:   _check_and_expand_y() and _check_and_expand_t()
+  max_gap:     _insert_nans() for each panel
+  render:      stackplot(returnimage=True) and a draw of the canvas
+  savefig:     PNG encode of the drawn figure
+  timeseries:  timeseries(returnimage=True) with one column per panel and a
+               draw of the canvas
+Each time is the minimum of repeat runs. Peak memory is measured with
+tracemalloc in a separate run because tracing slows execution. Cases with
+more than max_total values (points*panels) are skipped.
+
+With --compare, the ratio of each time to the saved time is printed and the
+exit status is 1 if any ratio exceeds 1 + tolerance.
+"""
+import io
+import sys
+import json
+import time
+import argparse
+import platform
+import datetime
+import tracemalloc
+import contextlib
+
+import numpy as np
+
+stages = ['normalize', 'max_gap', 'render', 'savefig', 'timeseries']
+
+def data(points, panels, seed=0):
+  """1-second datetime64 t with a 10-minute gap and random walk y for each panel"""
+  t = np.datetime64('2000-01-01') + np.arange(points).astype('timedelta64[s]')
+  t[points//2:] += np.timedelta64(10, 'm')
+  rng = np.random.default_rng(seed)
+  y = [np.cumsum(rng.standard_normal(points)) for _ in range(panels)]
+  return t, y
+
+def run(stage, t, y):
+  """Run stage once"""
+
+  from stackplot import stackplot, _check_and_expand_y, _check_and_expand_t
+  from stackplot import _insert_nans, _t_to_float, _dt_to_float
+
+  if stage == 'normalize':
+    yn = _check_and_expand_y(y)
+    _check_and_expand_t(t, yn)
+  elif stage == 'max_gap':
+    tf = _t_to_float(t)
+    max_gap = _dt_to_float(datetime.timedelta(minutes=1), tol=True)
+    for yi in y:
+      _insert_nans(tf, yi, max_gap)
+  elif stage in ['render', 'savefig']:
+    fig = stackplot(t, y, max_gap=datetime.timedelta(minutes=1), returnimage=True)
+    fig.canvas.draw()
+    if stage == 'savefig':
+      return fig
+  elif stage == 'timeseries':
+    from timeseries import timeseries
+    fig = timeseries(t, np.array(y).T, returnimage=True)
+    fig.canvas.draw()
+  else:
+    raise ValueError(f'stage = {stage} must be one of {stages}')
+
+def measure(stage, points, panels, repeat=3):
+  """Return dict with minimum time in seconds and peak traced memory in bytes"""
+
+  t, y = data(points, panels)
+
+  with contextlib.redirect_stdout(io.StringIO()):
+    times = []
+    for _ in range(repeat):
+      if stage == 'savefig':
+        # Only the encode is timed.
+        fig = run(stage, t, y)
+        start = time.perf_counter()
+        fig.savefig(io.BytesIO(), format='png')
+        times.append(time.perf_counter() - start)
+      else:
+        start = time.perf_counter()
+        run(stage, t, y)
+        times.append(time.perf_counter() - start)
+
+    if stage == 'savefig':
+      fig = run(stage, t, y)
+    tracemalloc.start()
+    try:
+      if stage == 'savefig':
+        fig.savefig(io.BytesIO(), format='png')
+      else:
+        run(stage, t, y)
+      _, peak = tracemalloc.get_traced_memory()
+    finally:
+      tracemalloc.stop()
+
+  return {'stage': stage, 'points': points, 'panels': panels,
+          'time': min(times), 'peak': peak}
+
+def benchmark(points=None, panels=None, stages=stages, repeat=3, max_total=2e7, log=print):
+  """Run benchmarks and return dict with keys 'meta' and 'results'"""
+
+  import matplotlib
+  matplotlib.use('Agg')
+
+  if points is None:
+    points = [10**3, 10**4, 10**5, 10**6, 10**7]
+  if panels is None:
+    panels = [1, 5, 20]
+
+  meta = {
+          'date': datetime.datetime.now().isoformat(timespec='seconds'),
+          'python': platform.python_version(),
+          'numpy': np.__version__,
+          'matplotlib': matplotlib.__version__,
+          'machine': platform.machine(),
+          'platform': platform.platform()
+        }
+
+  # Imports, font loading, and caches filled on first use are not timed.
+  for stage in stages:
+    measure(stage, 100, 1, repeat=1)
+
+  results = []
+  for n_panels in panels:
+    for n_points in points:
+      if n_points*n_panels > max_total:
+        log(f'Skipping {n_points} points x {n_panels} panels > max_total = {max_total:g}')
+        continue
+      for stage in stages:
+        result = measure(stage, n_points, n_panels, repeat=repeat)
+        log(_format(result))
+        results.append(result)
+
+  return {'meta': meta, 'results': results}
+
+def compare(results, baseline, tolerance=0.25, log=print):
+  """Return list of results that are slower than baseline by more than tolerance"""
+
+  def key(result):
+    return (result['stage'], result['points'], result['panels'])
+
+  saved = {key(result): result for result in baseline['results']}
+  slower = []
+  for result in results['results']:
+    if key(result) not in saved:
+      continue
+    ratio = result['time']/saved[key(result)]['time']
+    flag = ''
+    if ratio > 1 + tolerance:
+      flag = '  SLOWER'
+      slower.append(result)
+    log(f'{_format(result)}  x{ratio:.2f} of baseline{flag}')
+
+  return slower
+
+def _format(result):
+  return (f"{result['stage']:>10s} {result['points']:>9d} points {result['panels']:>3d} panels"
+          f"  {1000*result['time']:10.2f} ms  {result['peak']/2**20:9.1f} MiB")
+
+def _cli(argv=None):
+
+  parser = argparse.ArgumentParser(description='Benchmark stackplot() and timeseries().')
+  parser.add_argument('--points', type=float, nargs='+', default=None,
+                      help='Number of points per panel (default: 1e3 1e4 1e5 1e6 1e7)')
+  parser.add_argument('--panels', type=int, nargs='+', default=None,
+                      help='Number of panels (default: 1 5 20)')
+  parser.add_argument('--stages', nargs='+', default=stages, choices=stages)
+  parser.add_argument('--repeat', type=int, default=3)
+  parser.add_argument('--max-total', type=float, default=2e7,
+                      help='Skip cases with more than this number of values (default: 2e7)')
+  parser.add_argument('--save', default=None, help='Save results to this JSON file')
+  parser.add_argument('--compare', default=None, help='Compare with results saved in this JSON file')
+  parser.add_argument('--tolerance', type=float, default=0.25,
+                      help='Allowed fractional increase in time relative to --compare results')
+  args = parser.parse_args(argv)
+
+  points = None if args.points is None else [int(p) for p in args.points]
+  results = benchmark(points=points, panels=args.panels, stages=args.stages,
+                      repeat=args.repeat, max_total=args.max_total)
+
+  if args.save is not None:
+    with open(args.save, 'w') as f:
+      json.dump(results, f, indent=2)
+    print(f'Wrote {args.save}')
+
+  if args.compare is not None:
+    with open(args.compare) as f:
+      baseline = json.load(f)
+    print(f"Comparing with {args.compare} from {baseline['meta']['date']}")
+    slower = compare(results, baseline, tolerance=args.tolerance)
+    if len(slower) > 0:
+      print(f'{len(slower)} of {len(results["results"])} cases are slower than baseline')
+      return 1
+
+  return 0
+
+if __name__ == '__main__':
+  sys.exit(_cli())
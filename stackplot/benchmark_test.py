@@ -0,0 +1,28 @@
+import os
+import json
+import shutil
+import tempfile
+
+from benchmark import _cli, compare
+
+tmp = tempfile.mkdtemp()
+try:
+  file = os.path.join(tmp, 'baseline.json')
+  args = ['--points', '1e3', '1e4', '--panels', '1', '2', '--repeat', '1', '--save', file]
+  assert _cli(args) == 0
+
+  with open(file) as f:
+    baseline = json.load(f)
+  assert len(baseline['results']) == 2*2*5
+  assert all(result['time'] > 0 and result['peak'] > 0 for result in baseline['results'])
+
+  # A baseline 10x faster than the current results is a regression.
+  faster = {'meta': baseline['meta'],
+            'results': [dict(result, time=result['time']/10) for result in baseline['results']]}
+  assert len(compare(baseline, faster)) == len(baseline['results'])
+  assert len(compare(baseline, baseline)) == 0
+
+  assert _cli(['--points', '1e3', '--panels', '1', '--repeat', '1', '--compare', file,
+               '--tolerance', '100']) == 0
+finally:
+  shutil.rmtree(tmp)
@@ -0,0 +1,48 @@
+"""Files of the on-disk caches in hapi_cache.py and render_cache.py
+
+Usage:
+  from cache_files import write, evict
+  write(file, lambda f: f.write(image))
+  evict(directory, max_size, '.img')
+
+One directory may be used by several threads and processes at once. A file
+is written to a temporary file that is then renamed, so a partially written
+file is never read, and a file removed by another caller is skipped.
+"""
+import os
+import threading
+
+def write(file, save, mode='wb'):
+  """Call save(f) with f open on a temporary file and rename it to file"""
+  tmp = file + f'.{os.getpid()}.{threading.get_ident()}.tmp'
+  with open(tmp, mode) as f:
+    save(f)
+  os.replace(tmp, file)
+
+def evict(directory, max_size, extension):
+  """Remove the least recently used files in directory (and its subdirectories)
+  that end with extension until their total size is <= max_size
+
+  Files are used when they are written or marked with os.utime().
+  """
+
+  files = []
+  for root, _, names in os.walk(directory):
+    for name in names:
+      if name.endswith(extension):
+        file = os.path.join(root, name)
+        try:
+          stat = os.stat(file)
+        except FileNotFoundError:
+          continue # Removed by another caller
+        files.append((stat.st_mtime, stat.st_size, file))
+
+  total = sum(size for _, size, _ in files)
+  for _, size, file in sorted(files):
+    if total <= max_size:
+      break
+    try:
+      os.remove(file)
+    except FileNotFoundError:
+      pass
+    total -= size
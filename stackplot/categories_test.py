@@ -0,0 +1,36 @@
+# Tests of categories() and timeseries() with string values in the local
+# timeseries module (timeseries_test.py tests hapiplot's timeseries()).
+import time
+import numpy as np
+
+from timeseries import timeseries, categories
+
+# String values with more categories than maxcategories
+N = 1000000
+rng = np.random.default_rng(0)
+states = np.array(['state{0:02d}'.format(i) for i in range(40)])
+# Most values are in the first few states
+ys = states[np.minimum(rng.geometric(0.3, N) - 1, 39)]
+ts = np.datetime64('2000-01-01') + np.arange(N).astype('timedelta64[s]')
+
+codes, labels = categories(ys, maxcategories=10)
+assert len(labels) == 10 and labels[-1] == 'other'
+assert np.all(labels[codes[ys == 'state00'].astype(int)] == 'state00')
+assert np.all(codes[ys == 'state39'] == 9)
+
+codes, labels = categories(ys, maxcategories=None)
+assert np.array_equal(labels[codes.astype(int)], ys)
+
+# A category named "other" is not merged with the others
+yo = np.array(['other']*5 + ['other 2']*4 + ['a']*3 + ['b', 'c'])
+codes, labels = categories(yo, maxcategories=3)
+assert list(labels) == ['other', 'other 2', 'other 3']
+assert np.array_equal(codes, [0]*5 + [1]*4 + [2]*5)
+
+start_time = time.perf_counter()
+title = '{0:d} string values in 40 categories'.format(N)
+fig = timeseries(ts, ys, title=title, maxcategories=None, returnimage=True)
+print('{0:.2f} s for {1:s}'.format(time.perf_counter() - start_time, title))
+assert len(fig.axes[0].get_yticks()) < 40
+
+print('categories_test.py passed')
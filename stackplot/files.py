@@ -0,0 +1,196 @@
+"""Read time series from column files for stackplot() without loading them
+
+Usage:
+  from files import from_files
+  t, y = from_files('time.npy', ['bz.npy', 'symh.npy'], start=start, stop=stop)
+  stackplot(t, y)
+
+Each of t and y[i] is a file specification:
+  'file.npy'                 NumPy .npy file (memory mapped)
+  ('file.bin', dtype)        Raw binary file with values of type dtype (memory mapped)
+  ('file.arrow', column)     Arrow IPC/Feather file column (memory mapped;
+                             extensions .arrow, .feather, .ipc)
+  ('file.parquet', column)   Parquet file column
+
+Arrow and Parquet files require pyarrow. The time column must be sorted.
+Only the values with start <= t < stop are returned, and for .npy, raw, and
+uncompressed Arrow files these are views into the memory-mapped file. The
+index range is found with a binary search on t, so only the pages needed
+for the search and the returned values are read from disk. For Arrow files
+with more than one record batch and for Parquet files, only the batches or
+row groups that contain the returned values are read.
+"""
+import os
+
+import numpy as np
+
+arrow_extensions = ['.arrow', '.feather', '.ipc']
+
+def from_files(t, y, start=None, stop=None):
+  """Return t, y for start <= t < stop; y is a list if y is a list"""
+
+  y_list = y if isinstance(y, list) else [y]
+
+  tc = _open(t)
+  lo, hi = 0, len(tc)
+  if start is not None:
+    lo = _searchsorted(tc, start)
+  if stop is not None:
+    hi = _searchsorted(tc, stop)
+
+  ys = []
+  for spec in y_list:
+    yc = _open(spec)
+    if len(yc) != len(tc):
+      raise ValueError(f'{spec} has {len(yc)} values but {t} has {len(tc)} values')
+    ys.append(yc[lo:hi])
+
+  if not isinstance(y, list):
+    return tc[lo:hi], ys[0]
+  return tc[lo:hi], ys
+
+def _open(spec):
+  """Memory-mapped array or _ParquetColumn for spec"""
+
+  if isinstance(spec, tuple):
+    file, arg = spec
+  else:
+    file, arg = spec, None
+
+  ext = os.path.splitext(file)[1].lower()
+
+  if ext == '.npy':
+    return np.load(file, mmap_mode='r')
+
+  if ext in arrow_extensions:
+    try:
+      import pyarrow as pa
+    except ImportError:
+      raise ImportError(f'pyarrow is required to read {file}')
+    reader = pa.ipc.open_file(pa.memory_map(file, 'r'))
+    if reader.num_record_batches == 1:
+      # Zero-copy if the column has no nulls and is not compressed.
+      return reader.get_batch(0).column(arg).to_numpy(zero_copy_only=False)
+    return _ArrowColumn(reader, arg)
+
+  if ext == '.parquet':
+    return _ParquetColumn(file, arg)
+
+  if arg is None:
+    raise ValueError(f'dtype must be given for raw binary file {file}, e.g., ("{file}", "float64")')
+  return np.memmap(file, dtype=arg, mode='r')
+
+def _searchsorted(t, value):
+  """Index of first element of sorted t that is >= value"""
+
+  if isinstance(t, (_ParquetColumn, _ArrowColumn)):
+    return t.searchsorted(value)
+
+  if np.issubdtype(t.dtype, np.datetime64):
+    value = np.datetime64(value).astype(t.dtype)
+  return np.searchsorted(t, value, side='left')
+
+class _ParquetColumn:
+  """Column of a Parquet file that reads only the row groups that are needed"""
+
+  def __init__(self, file, column):
+    try:
+      import pyarrow.parquet as pq
+    except ImportError:
+      raise ImportError(f'pyarrow is required to read {file}')
+    self.file = file
+    self.column = column
+    self.pf = pq.ParquetFile(file, memory_map=True)
+    meta = self.pf.metadata
+    counts = [meta.row_group(g).num_rows for g in range(0, meta.num_row_groups)]
+    # Index of first row of each row group and number of rows
+    self.rows = np.concatenate(([0], np.cumsum(counts))).astype(int)
+    self.index = self.pf.schema_arrow.get_field_index(column)
+
+  def __len__(self):
+    return int(self.rows[-1])
+
+  def __getitem__(self, s):
+    start, stop, _ = s.indices(len(self))
+    if stop <= start:
+      return self._read([])[0:0]
+    g0 = np.searchsorted(self.rows, start, side='right') - 1
+    g1 = np.searchsorted(self.rows, stop, side='left')
+    values = self._read(range(g0, g1))
+    return values[start - self.rows[g0]:stop - self.rows[g0]][::s.step]
+
+  def _read(self, groups):
+    table = self.pf.read_row_groups(list(groups), columns=[self.column])
+    return table.column(self.column).to_numpy()
+
+  def searchsorted(self, value):
+    """Like np.searchsorted(column, value), reading one row group
+
+    Uses row group statistics to find the row group that contains value.
+    """
+    meta = self.pf.metadata
+    if isinstance(value, str) or hasattr(value, 'year'):
+      value = np.datetime64(value)
+    for g in range(0, meta.num_row_groups):
+      stats = meta.row_group(g).column(self.index).statistics
+      if stats is None or not stats.has_min_max:
+        break
+      if _ge(stats.max, value):
+        values = self._read([g])
+        if np.issubdtype(values.dtype, np.datetime64):
+          value = np.datetime64(value).astype(values.dtype)
+        return int(self.rows[g] + np.searchsorted(values, value, side='left'))
+    else:
+      return len(self)
+
+    # No statistics; read the entire column.
+    return _searchsorted(self[:], value)
+
+class _ArrowColumn:
+  """Column of an Arrow file with more than one record batch
+
+  Only the batches that contain the requested values are converted, each
+  with zero copy if possible.
+  """
+
+  def __init__(self, reader, column):
+    batches = [reader.get_batch(b).column(column) for b in range(0, reader.num_record_batches)]
+    self.batches = [batch for batch in batches if len(batch) > 0]
+    # Index of first row of each batch and number of rows
+    counts = [len(batch) for batch in self.batches]
+    self.rows = np.concatenate(([0], np.cumsum(counts))).astype(int)
+
+  def __len__(self):
+    return int(self.rows[-1])
+
+  def __getitem__(self, s):
+    start, stop, _ = s.indices(len(self))
+    if stop <= start:
+      return self._read(0)[0:0] if len(self.batches) > 0 else np.empty(0)
+    g0 = np.searchsorted(self.rows, start, side='right') - 1
+    g1 = np.searchsorted(self.rows, stop, side='left')
+    values = [self._read(g) for g in range(g0, g1)]
+    values = values[0] if len(values) == 1 else np.concatenate(values)
+    return values[start - self.rows[g0]:stop - self.rows[g0]][::s.step]
+
+  def _read(self, g):
+    return self.batches[g].to_numpy(zero_copy_only=False)
+
+  def searchsorted(self, value):
+    """Like np.searchsorted(column, value), converting one batch
+
+    Uses the first value of each batch to find the batch that contains value.
+    """
+    if len(self.batches) == 0:
+      return 0
+    firsts = np.concatenate([batch[0:1].to_numpy(zero_copy_only=False) for batch in self.batches])
+    g = _searchsorted(firsts, value)
+    if g == 0:
+      return 0
+    return int(self.rows[g - 1] + _searchsorted(self._read(g - 1), value))
+
+def _ge(a, b):
+  """a >= b for numbers and datetimes"""
+  if hasattr(a, 'year') or isinstance(b, np.datetime64):
+    a, b = np.datetime64(a, 'ns'), np.datetime64(b, 'ns')
+  return bool(a >= b)
@@ -0,0 +1,93 @@
+import os
+import shutil
+import tempfile
+from datetime import datetime
+
+import numpy as np
+
+from files import from_files
+
+tmp = tempfile.mkdtemp()
+try:
+  n = 10*1440
+  t = np.datetime64('2000-01-01', 'ns') + np.arange(n)*np.timedelta64(1, 'm')
+  y = np.arange(n, dtype=float)
+
+  np.save(os.path.join(tmp, 't.npy'), t)
+  np.save(os.path.join(tmp, 'y.npy'), y)
+  y.astype('float32').tofile(os.path.join(tmp, 'y.bin'))
+
+  start = np.datetime64('2000-01-03')
+  stop = np.datetime64('2000-01-04')
+  expected = y[2*1440:3*1440]
+
+  tr, yr = from_files(os.path.join(tmp, 't.npy'),
+                      [os.path.join(tmp, 'y.npy'), (os.path.join(tmp, 'y.bin'), 'float32')],
+                      start=start, stop=stop)
+  assert tr[0] == start and len(tr) == 1440
+  assert np.array_equal(yr[0], expected) and np.array_equal(yr[1], expected)
+  # Views into memory-mapped files, not copies
+  assert isinstance(tr, np.memmap) and isinstance(yr[0], np.memmap) and isinstance(yr[1], np.memmap)
+
+  # datetime start and stop, y not a list
+  tr, yr = from_files(os.path.join(tmp, 't.npy'), os.path.join(tmp, 'y.npy'),
+                      start=datetime(2000, 1, 3), stop=datetime(2000, 1, 4))
+  assert np.array_equal(yr, expected)
+
+  try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+  except ImportError:
+    pa = None
+    print('pyarrow not installed; skipping Arrow and Parquet tests')
+
+  if pa is not None:
+    table = pa.table({'Time': t, 'y': y})
+    with pa.OSFile(os.path.join(tmp, 'data.arrow'), 'wb') as sink:
+      with pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    pq.write_table(table, os.path.join(tmp, 'data.parquet'), row_group_size=1440)
+
+    for file in ['data.arrow', 'data.parquet']:
+      file = os.path.join(tmp, file)
+      tr, yr = from_files((file, 'Time'), [(file, 'y')], start=start, stop=stop)
+      assert tr[0] == start and len(tr) == 1440, file
+      assert np.array_equal(yr[0], expected), file
+
+    # Interval that spans row groups
+    tr, yr = from_files((file, 'Time'), [(file, 'y')],
+                        start=np.datetime64('2000-01-03T12'), stop=np.datetime64('2000-01-05T06'))
+    assert np.array_equal(yr[0], y[int(2.5*1440):int(4.25*1440)])
+
+    # Arrow file with several record batches; only the batches of the
+    # interval are converted.
+    import tracemalloc
+    file = os.path.join(tmp, 'batches.arrow')
+    n = 2000000
+    tb = np.datetime64('2000-01-01', 'ns') + np.arange(n)*np.timedelta64(1, 's')
+    yb = np.arange(n, dtype=float)
+    table = pa.table({'Time': tb, 'y': yb})
+    with pa.OSFile(file, 'wb') as sink:
+      with pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table, max_chunksize=43200)
+    # Memory allocated by NumPy and memory held by Arrow for the result
+    arrow = pa.total_allocated_bytes()
+    tracemalloc.start()
+    tr, yr = from_files((file, 'Time'), [(file, 'y')], start=start, stop=stop)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    peak += pa.total_allocated_bytes() - arrow
+    print(f'One day of {n} values in {n//43200 + 1} batches: {peak/2**20:.1f} MiB allocated')
+    assert tr[0] == start and len(tr) == 86400
+    assert np.array_equal(yr[0], yb[2*86400:3*86400])
+    assert peak < tb.nbytes/4
+
+    tr, yr = from_files((file, 'Time'), [(file, 'y')],
+                        start=np.datetime64('2000-01-03T12'), stop=np.datetime64('2000-01-05T06'))
+    assert np.array_equal(yr[0], yb[int(2.5*86400):int(4.25*86400)])
+    tr, yr = from_files((file, 'Time'), [(file, 'y')], start=np.datetime64('1999-01-01'))
+    assert np.array_equal(tr, tb) and np.array_equal(yr[0], yb)
+
+  print('files_test passed')
+finally:
+  shutil.rmtree(tmp)
@@ -0,0 +1,176 @@
+"""On-disk cache for HAPI data used by stackplot_hapi.py
+
+Usage:
+  from hapi_cache import hapi_cached
+  data, meta = hapi_cached(server, dataset, parameters, start, stop)
+
+Data are cached in files keyed by server, dataset, parameter, and UTC day:
+  cache_dir/<server>/<dataset>/<parameter>/<YYYY-MM-DD>.npy
+Each file holds a structured array with fields 'Time' and the parameter for
+that day. Metadata are cached in meta.json files in the <dataset> and
+<parameter> directories. Only days that are not in the cache are requested; consecutive
+uncached days are requested in one call. When the total size of the cache
+exceeds max_size bytes, the least recently used files are removed.
+
+Files are written and evicted with cache_files.py, and a file removed by
+another caller while it is being read is treated as uncached, so one cache
+directory may be used by several threads and processes at once.
+"""
+import os
+import json
+import urllib.parse
+
+import numpy as np
+
+from cache_files import write, evict
+
+cache_dir_default = os.path.join(os.path.expanduser('~'), '.cache', 'stackplot', 'hapi')
+max_size_default = 2**30 # bytes
+
+def hapi_cached(server, dataset, parameters, start, stop, cache_dir=None,
+                max_size=max_size_default, fetch=None, **kwargs):
+  """Same as hapiclient.hapi(server, dataset, parameters, start, stop)
+
+  fetch is the function used to request uncached days and has the signature
+  of hapiclient.hapi; it defaults to hapiclient.hapi. kwargs are passed to
+  fetch. start and stop must be HAPI ISO 8601 strings with a trailing Z.
+  Days that end after the current time are not cached because they may be
+  incomplete.
+  """
+
+  if fetch is None:
+    from hapiclient import hapi as fetch
+
+  if cache_dir is None:
+    cache_dir = cache_dir_default
+
+  parameter_list = parameters.split(',')
+  dataset_dir = os.path.join(cache_dir, urllib.parse.quote(server, safe=''),
+                             urllib.parse.quote(dataset, safe=''))
+
+  start64 = _datetime64(start)
+  stop64 = _datetime64(stop)
+  days = np.arange(start64.astype('datetime64[D]'), stop64, np.timedelta64(1, 'D')).astype('datetime64[D]')
+  now = np.datetime64('now')
+
+  meta = _load_meta(dataset_dir, parameter_list)
+
+  chunks = [_load(dataset_dir, parameter_list, day) for day in days]
+  if meta is None:
+    # Metadata are needed to assemble the result; re-request everything.
+    chunks = [None]*len(days)
+
+  # Request each run of consecutive uncached days in one call.
+  missing = np.array([chunk is None for chunk in chunks], dtype=bool)
+  edges = np.flatnonzero(np.diff(np.concatenate(([0], missing.astype(int), [0]))))
+  for a, b in zip(edges[0::2], edges[1::2]):
+    run_start = _isotime(days[a])
+    run_stop = _isotime(days[b - 1] + np.timedelta64(1, 'D'))
+    data, meta = fetch(server, dataset, parameters, run_start, run_stop, **kwargs)
+    time = _datetime64(data['Time'])
+    for k in range(a, b):
+      lo, hi = np.searchsorted(time, [days[k], days[k] + np.timedelta64(1, 'D')])
+      chunks[k] = data[lo:hi]
+      if days[k] + np.timedelta64(1, 'D') <= now:
+        _save(dataset_dir, parameter_list, days[k], chunks[k])
+    _save_meta(dataset_dir, meta)
+
+  if len(chunks) == 0:
+    data, meta = fetch(server, dataset, parameters, start, stop, **kwargs)
+    return data, meta
+
+  data = np.concatenate(chunks)
+  time = _datetime64(data['Time'])
+  lo, hi = np.searchsorted(time, [start64, stop64])
+  data = data[lo:hi]
+
+  evict(cache_dir, max_size, '.npy')
+
+  return data, meta
+
+def _datetime64(time):
+  """Convert HAPI time string or array of strings to datetime64[ns]"""
+  if isinstance(time, str):
+    return np.datetime64(time.rstrip('Z'), 'ns')
+  time = np.char.rstrip(np.asarray(time).astype('U'), 'Z')
+  try:
+    return time.astype('datetime64[ns]')
+  except ValueError:
+    # Day-of-year or other formats that NumPy does not parse
+    from hapiclient import hapitime2datetime
+    return np.array(hapitime2datetime(time), dtype='datetime64[ns]')
+
+def _isotime(t):
+  return np.datetime_as_string(t.astype('datetime64[ms]')) + 'Z'
+
+def _file(dataset_dir, parameter, day):
+  return os.path.join(dataset_dir, urllib.parse.quote(parameter, safe=''), f'{day}.npy')
+
+def _load(dataset_dir, parameter_list, day):
+  """Structured array with Time and all parameters or None if not cached"""
+
+  files = [_file(dataset_dir, parameter, day) for parameter in parameter_list]
+  if not all(os.path.exists(file) for file in files):
+    return None
+
+  columns = []
+  try:
+    for file in files:
+      columns.append(np.load(file, mmap_mode='r'))
+      os.utime(file) # Mark as recently used
+  except FileNotFoundError:
+    return None # Removed by another caller
+
+  dtype = [('Time', columns[0].dtype['Time'])]
+  for parameter, column in zip(parameter_list, columns):
+    dtype.append((parameter, column.dtype[parameter]))
+  data = np.empty(len(columns[0]), dtype=dtype)
+  data['Time'] = columns[0]['Time']
+  for parameter, column in zip(parameter_list, columns):
+    data[parameter] = column[parameter]
+
+  return data
+
+def _load_meta(dataset_dir, parameter_list):
+  """Metadata for parameter_list assembled from cached metadata or None"""
+
+  files = [os.path.join(dataset_dir, 'meta.json')]
+  for parameter in parameter_list + ['Time']:
+    files.append(os.path.join(dataset_dir, urllib.parse.quote(parameter, safe=''), 'meta.json'))
+  if not all(os.path.exists(file) for file in files):
+    return None
+
+  parts = []
+  try:
+    for file in files:
+      with open(file) as f:
+        parts.append(json.load(f))
+  except FileNotFoundError:
+    return None
+
+  meta = parts[0]
+  meta['parameters'] = [parts[-1]] + parts[1:-1]
+  return meta
+
+def _save_meta(dataset_dir, meta):
+  """Save dataset metadata and each parameter's metadata separately"""
+
+  files = {os.path.join(dataset_dir, 'meta.json'):
+             {k: v for k, v in meta.items() if k != 'parameters'}}
+  for parameter in meta['parameters']:
+    file = os.path.join(dataset_dir, urllib.parse.quote(parameter['name'], safe=''), 'meta.json')
+    files[file] = parameter
+
+  for file, content in files.items():
+    os.makedirs(os.path.dirname(file), exist_ok=True)
+    write(file, lambda f: json.dump(content, f, default=str), mode='w')
+
+def _save(dataset_dir, parameter_list, day, data):
+
+  for parameter in parameter_list:
+    file = _file(dataset_dir, parameter, day)
+    os.makedirs(os.path.dirname(file), exist_ok=True)
+    column = np.empty(len(data), dtype=[('Time', data.dtype['Time']), (parameter, data.dtype[parameter])])
+    column['Time'] = data['Time']
+    column[parameter] = data[parameter]
+    write(file, lambda f: np.save(f, column))
@@ -0,0 +1,78 @@
+import os
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from hapi_cache import hapi_cached, _datetime64
+
+requests = []
+
+def fetch(server, dataset, parameters, start, stop, **kwargs):
+  """Stand-in for hapiclient.hapi() that returns 1-minute data"""
+  requests.append((start, stop))
+  parameter_list = parameters.split(',')
+  time = np.arange(_datetime64(start), _datetime64(stop), np.timedelta64(1, 'm'))
+  dtype = [('Time', 'S24')] + [(p, float) for p in parameter_list]
+  data = np.empty(len(time), dtype=dtype)
+  data['Time'] = np.char.add(np.datetime_as_string(time, unit='ms'), 'Z').astype('S24')
+  minutes = (time - np.datetime64('2000-01-01')).astype('timedelta64[m]').astype(float)
+  for k, p in enumerate(parameter_list):
+    data[p] = minutes + k
+  meta = {'parameters': [{'name': 'Time'}] + [{'name': p} for p in parameter_list]}
+  return data, meta
+
+cache_dir = tempfile.mkdtemp()
+try:
+  server, dataset = 'http://localhost/hapi', 'TEST_1MIN'
+
+  data, meta = hapi_cached(server, dataset, 'A,B', '2000-01-02T00:00:00Z',
+                           '2000-01-04T12:00:00Z', cache_dir=cache_dir, fetch=fetch)
+  assert requests == [('2000-01-02T00:00:00.000Z', '2000-01-05T00:00:00.000Z')]
+  assert len(data) == 2.5*1440
+  assert data['Time'][0] == b'2000-01-02T00:00:00.000Z'
+  assert np.all(data['B'] == data['A'] + 1)
+
+  # Same interval => no requests
+  requests.clear()
+  data2, meta2 = hapi_cached(server, dataset, 'A,B', '2000-01-02T00:00:00Z',
+                             '2000-01-04T12:00:00Z', cache_dir=cache_dir, fetch=fetch)
+  assert requests == []
+  assert np.array_equal(data, data2) and meta2 == meta
+
+  # Only uncached days are requested
+  data, meta = hapi_cached(server, dataset, 'A,B', '2000-01-01T06:00:00Z',
+                           '2000-01-06T00:00:00Z', cache_dir=cache_dir, fetch=fetch)
+  assert requests == [('2000-01-01T00:00:00.000Z', '2000-01-02T00:00:00.000Z'),
+                      ('2000-01-05T00:00:00.000Z', '2000-01-06T00:00:00.000Z')]
+  assert len(data) == 4.75*1440
+  assert np.all(np.diff(_datetime64(data['Time'])) == np.timedelta64(1, 'm'))
+
+  # LRU eviction; each file has 1440 values
+  size = os.path.getsize(os.path.join(cache_dir, 'http%3A%2F%2Flocalhost%2Fhapi', 'TEST_1MIN', 'A', '2000-01-02.npy'))
+  requests.clear()
+  data, meta = hapi_cached(server, dataset, 'A', '2000-01-05T00:00:00Z',
+                           '2000-01-06T00:00:00Z', cache_dir=cache_dir, fetch=fetch,
+                           max_size=3*size)
+  assert requests == []
+  npy = [f for _, _, fs in os.walk(cache_dir) for f in fs if f.endswith('.npy')]
+  assert len(npy) == 3
+  assert os.path.exists(os.path.join(cache_dir, 'http%3A%2F%2Flocalhost%2Fhapi', 'TEST_1MIN', 'A', '2000-01-05.npy'))
+
+  # Threads sharing one cache directory, with eviction while others read
+  shared_dir = os.path.join(cache_dir, 'shared')
+  def request(k):
+    day = 1 + k % 5
+    data, meta = hapi_cached(server, dataset, 'A,B', f'2000-01-{day:02d}T00:00:00Z',
+                             f'2000-01-{day + 2:02d}T00:00:00Z', cache_dir=shared_dir,
+                             fetch=fetch, max_size=4*size)
+    assert len(data) == 2*1440 and np.all(data['B'] == data['A'] + 1)
+    assert [p['name'] for p in meta['parameters']] == ['Time', 'A', 'B']
+  with ThreadPoolExecutor(max_workers=8) as pool:
+    list(pool.map(request, range(200)))
+  assert not any(f.endswith('.tmp') for _, _, fs in os.walk(shared_dir) for f in fs)
+
+  print('hapi_cache_test passed')
+finally:
+  shutil.rmtree(cache_dir)
@@ -0,0 +1,95 @@
+"""Parallel, chunked HAPI requests
+
+Usage:
+  from hapi_chunks import hapi_arrays
+  t, y, meta, timing = hapi_arrays(server, dataset, parameters, start, stop, workers=4)
+  stackplot(t, [y['BZ_GSM'], y['SYM_H']])
+
+[start, stop) is split into chunks (by default, UTC days) that are requested
+concurrently by at most workers threads. Chunks are returned in time order
+and only a bounded number are held in memory at once, so each chunk can be
+converted to plotting arrays as soon as it and all earlier chunks arrive.
+"""
+import time as _time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from hapi_cache import _datetime64, _isotime
+
+def hapi_chunks(server, dataset, parameters, start, stop, workers=4,
+                chunk=np.timedelta64(1, 'D'), fetch=None, **kwargs):
+  """Generator of (data, meta, info) for each chunk of [start, stop) in time order
+
+  fetch has the signature of hapiclient.hapi and defaults to hapiclient.hapi;
+  it is called from the worker threads, so it must be thread safe. E.g., use
+  fetch=hapi_cache.hapi_cached, which is, to cache chunks on disk. kwargs are
+  passed to fetch. Chunk boundaries are multiples of chunk (since 1970-01-01).
+  info is a dict with keys
+    'start', 'stop': chunk interval,
+    'n': number of records,
+    'time': wall time in seconds for the request.
+  """
+
+  if fetch is None:
+    from hapiclient import hapi as fetch
+
+  intervals = _intervals(_datetime64(start), _datetime64(stop), chunk)
+
+  def _fetch(interval):
+    a, b = _isotime(interval[0]), _isotime(interval[1])
+    t0 = _time.perf_counter()
+    data, meta = fetch(server, dataset, parameters, a, b, **kwargs)
+    info = {'start': a, 'stop': b, 'n': len(data), 'time': _time.perf_counter() - t0}
+    return data, meta, info
+
+  with ThreadPoolExecutor(max_workers=workers) as pool:
+    pending = deque()
+    intervals = iter(intervals)
+    for interval in intervals:
+      pending.append(pool.submit(_fetch, interval))
+      if len(pending) == workers:
+        break
+    while pending:
+      result = pending.popleft().result()
+      # Start the next request before the caller processes this chunk.
+      interval = next(intervals, None)
+      if interval is not None:
+        pending.append(pool.submit(_fetch, interval))
+      yield result
+
+def hapi_arrays(server, dataset, parameters, start, stop, workers=4,
+                chunk=np.timedelta64(1, 'D'), fetch=None, **kwargs):
+  """Request [start, stop) in parallel chunks and return plotting arrays
+
+  Returns t, y, meta, timing, where t is a datetime64[ns] array, y is a dict
+  with an array for each parameter, and timing is a list with the info dict
+  from hapi_chunks() for each chunk. Each chunk's time strings are parsed
+  and discarded as soon as the chunk arrives.
+  """
+
+  parameter_list = parameters.split(',')
+  t = []
+  y = {parameter: [] for parameter in parameter_list}
+  meta = None
+  timing = []
+  for data, meta, info in hapi_chunks(server, dataset, parameters, start, stop,
+                                      workers=workers, chunk=chunk, fetch=fetch, **kwargs):
+    t.append(_datetime64(data['Time']))
+    for parameter in parameter_list:
+      y[parameter].append(np.array(data[parameter]))
+    timing.append(info)
+
+  t = np.concatenate(t)
+  y = {parameter: np.concatenate(y[parameter]) for parameter in parameter_list}
+  return t, y, meta, timing
+
+def _intervals(start, stop, chunk):
+  """Split [start, stop) at multiples of chunk"""
+  unit = np.datetime_data(start.dtype)[0]
+  c = chunk.astype(f'timedelta64[{unit}]').astype('int64')
+  first = (start.astype('int64')//c + 1)*c
+  edges = np.arange(first, stop.astype('int64'), c).astype(start.dtype)
+  edges = np.concatenate(([start], edges, [stop]))
+  return list(zip(edges[0:-1], edges[1:]))
@@ -0,0 +1,94 @@
+import io
+import time
+import shutil
+import tempfile
+import functools
+import threading
+import urllib.parse
+import urllib.request
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import numpy as np
+
+from hapi_chunks import hapi_arrays, _intervals
+from hapi_cache import hapi_cached, _datetime64
+
+active = [0, 0] # [number of requests being handled, max number]
+served = [0]    # Number of requests handled
+lock = threading.Lock()
+
+class Handler(BaseHTTPRequestHandler):
+  """Mock HAPI server that returns 1-minute CSV data for /hapi/data"""
+
+  def do_GET(self):
+    url = urllib.parse.urlparse(self.path)
+    query = urllib.parse.parse_qs(url.query)
+    with lock:
+      served[0] += 1
+      active[0] += 1
+      active[1] = max(active[0], active[1])
+    time.sleep(0.1)
+    parameters = query['parameters'][0].split(',')
+    t = np.arange(_datetime64(query['start'][0]), _datetime64(query['stop'][0]), np.timedelta64(1, 'm'))
+    minutes = (t - np.datetime64('2000-01-01')).astype('timedelta64[m]').astype(int)
+    lines = []
+    for ts, m in zip(np.datetime_as_string(t, unit='ms'), minutes):
+      lines.append(ts + 'Z,' + ','.join(str(m + k) for k in range(len(parameters))))
+    body = ('\n'.join(lines) + '\n').encode()
+    with lock:
+      active[0] -= 1
+    self.send_response(200)
+    self.send_header('Content-Type', 'text/csv')
+    self.send_header('Content-Length', str(len(body)))
+    self.end_headers()
+    self.wfile.write(body)
+
+  def log_message(self, *args):
+    pass
+
+def fetch(server, dataset, parameters, start, stop):
+  """Minimal HAPI client for the mock server"""
+  query = urllib.parse.urlencode({'dataset': dataset, 'parameters': parameters,
+                                  'start': start, 'stop': stop})
+  with urllib.request.urlopen(f'{server}/data?{query}') as response:
+    csv = response.read()
+  dtype = [('Time', 'S24')] + [(p, float) for p in parameters.split(',')]
+  data = np.loadtxt(io.BytesIO(csv), dtype=dtype, delimiter=',', ndmin=1)
+  return data, {'parameters': [{'name': 'Time'}] + [{'name': p} for p in parameters.split(',')]}
+
+server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+threading.Thread(target=server.serve_forever, daemon=True).start()
+url = f'http://127.0.0.1:{server.server_address[1]}/hapi'
+
+try:
+  intervals = _intervals(np.datetime64('2000-01-01T12', 'ns'), np.datetime64('2000-01-03', 'ns'), np.timedelta64(1, 'D'))
+  assert len(intervals) == 2 and intervals[1][0] == np.datetime64('2000-01-02')
+
+  t, y, meta, timing = hapi_arrays(url, 'TEST_1MIN', 'A,B', '2000-01-01T12:00:00Z',
+                                   '2000-01-09T00:00:00Z', workers=3, fetch=fetch)
+  for info in timing:
+    print(f"{info['start']} to {info['stop']}: {info['n']} records in {info['time']:.3f} s")
+  print(f'Maximum number of concurrent requests = {active[1]}')
+
+  assert len(timing) == 8
+  assert 1 < active[1] <= 3
+  assert len(t) == 7.5*1440 and np.all(np.diff(t) == np.timedelta64(1, 'm'))
+  assert np.array_equal(y['B'], y['A'] + 1)
+  assert y['A'][0] == 720
+
+  # Threads share one on-disk cache; the second call makes no requests.
+  for run in range(5):
+    cache_dir = tempfile.mkdtemp()
+    try:
+      cached = functools.partial(hapi_cached, cache_dir=cache_dir, fetch=fetch)
+      for n_requests in [8, 0]:
+        served[0] = 0
+        t, y, meta, timing = hapi_arrays(url, 'TEST_1MIN', 'A,B', '2000-01-01T12:00:00Z',
+                                         '2000-01-09T00:00:00Z', workers=4, fetch=cached)
+        assert served[0] == n_requests
+        assert len(t) == 7.5*1440 and np.all(np.diff(t) == np.timedelta64(1, 'm'))
+        assert np.array_equal(y['B'], y['A'] + 1) and y['A'][0] == 720
+    finally:
+      shutil.rmtree(cache_dir)
+finally:
+  server.shutdown()
@@ -0,0 +1,64 @@
+import os
+import sys
+import subprocess
+
+# Budget for the import time of each module, in ms, excluding numpy, which
+# every module needs. Set STACKPLOT_IMPORT_BUDGET to override.
+budget = float(os.environ.get('STACKPLOT_IMPORT_BUDGET', 50))
+
+modules = ['stackplot', 'timeseries', 'batch', 'live', 'layout', 'render_cache',
+           'pyramid', 'files', 'hapi_cache', 'hapi_chunks', 'timings', 'resample',
+           'shared', 'cache_files']
+
+# Imported only when a figure is created
+heavy = ['matplotlib', 'pandas', 'datetick']
+
+def import_time(module):
+  """Cumulative import time of module in ms using python -X importtime"""
+  code = f'import numpy; import {module}; import sys; print(" ".join(sys.modules))'
+  result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code],
+                          capture_output=True, text=True, check=True,
+                          cwd=os.path.dirname(os.path.abspath(__file__)))
+  for line in result.stderr.splitlines():
+    # import time: self [us] | cumulative | imported package
+    parts = line.split('|')
+    if len(parts) == 3 and parts[2].strip() == module:
+      return int(parts[1])/1000., result.stdout.split()
+  raise ValueError(f'No import time found for {module}')
+
+failed = []
+for module in modules:
+  # Minimum of several runs to reduce noise
+  times = []
+  for _ in range(3):
+    ms, loaded = import_time(module)
+    times.append(ms)
+  ms = min(times)
+  loaded_heavy = [m for m in heavy if m in loaded]
+  print(f'{module:>12s} {ms:6.1f} ms  heavy modules imported: {loaded_heavy}')
+  if ms > budget or len(loaded_heavy) > 0:
+    failed.append(module)
+
+assert failed == [], f'Import time budget of {budget} ms exceeded or heavy modules imported by {failed}'
+
+# Rendering in a fresh process, where pyplot is not imported by this package
+# until a figure is created, works without pyplot state being used.
+code = """
+import io
+import numpy as np
+from matplotlib import _pylab_helpers
+from stackplot import stackplot
+from layout import StackPlotLayout
+from timeseries import timeseries
+png = stackplot(np.arange(100), np.arange(100.), returnimage='png')
+assert png.startswith(b'\\x89PNG')
+layout = StackPlotLayout(np.arange(100), [np.arange(100.), np.arange(100.)])
+layout.update(np.arange(50), [np.arange(50.), np.arange(50.)])
+layout.savefig(io.BytesIO(), format='png')
+timeseries(np.arange(100), np.arange(100.), returnimage=True).savefig(io.BytesIO(), format='png')
+assert _pylab_helpers.Gcf.get_num_fig_managers() == 0
+"""
+subprocess.run([sys.executable, '-c', code], check=True,
+               cwd=os.path.dirname(os.path.abspath(__file__)),
+               env={**os.environ, 'MPLBACKEND': 'Agg'})
+print('Rendered numeric t with returnimage in a fresh process')
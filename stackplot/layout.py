@@ -0,0 +1,184 @@
+"""Reuse one stack plot figure for many intervals with the same layout
+
+Usage:
+  from layout import StackPlotLayout
+  layout = StackPlotLayout(t, y, title=title, max_gap=timedelta(minutes=5))
+  layout.savefig('day1.png')
+  for day in days:
+    t, y = read(day)
+    layout.update(t, y, title=f'{day}')
+    layout.savefig(f'{day}.png')
+
+The first call creates the figure with stackplot() (using the Matplotlib OO
+API, as for returnimage=True). update() replaces the data of each line and
+updates the axes limits and tick labels, so the figure, axes, titles, and
+y labels are not created again. y passed to update() must have the same
+number of panels and traces as y passed to the constructor; the number of
+values may differ.
+
+If freeze_layout=True and the figure uses a layout engine (e.g.,
+rcParams['figure.constrained_layout.use'] = True), the layout is solved only
+when the y limits, the x span, or the titles differ from those at the last
+solve; otherwise the axes positions from the last solve are reused. The
+draws done by datetick() in update() also use the last solved positions.
+"""
+import copy
+
+import numpy as np
+
+from stackplot import _stackplot, _check_and_expand_y, _check_and_expand_t, _check_and_expand_style
+from stackplot import _is_list, _check_decimate, _prepare, _set_ylim, _plot_end_markers, _stats
+from stackplot import _extract_spectrograms, _datetick
+
+class StackPlotLayout:
+
+  def __init__(self, *args, title=None, style=None, max_gap=None, decimate=None,
+               max_points=None, xlim=None, freeze_layout=False):
+    """Create figure; arguments are the same as for stackplot()"""
+
+    if len(args) < 2:
+      t = None
+      y = args[0]
+    else:
+      t = args[0]
+      y = args[1]
+
+    if len(_extract_spectrograms(y)[1]) > 0:
+      raise ValueError('Spectrogram panels are not supported by StackPlotLayout')
+    _check_decimate(decimate)
+    self.title = title
+    self.max_gap = max_gap
+    self.decimate = decimate
+    self.max_points = max_points
+    self.freeze_layout = freeze_layout
+
+    self.fig, self.axes, lines = _stackplot(t, y, title, copy.deepcopy(style), max_gap,
+                                            decimate, max_points, True, xlim=xlim)
+
+    y = _check_and_expand_y(y)
+    if not _is_list(y[0]):
+      y = [y]
+    style = _check_and_expand_style(y, copy.deepcopy(style), dict)
+
+    # Flatten lines and styles to lists in order of traces; self.panels[k]
+    # is the panel index of trace k.
+    self.lines = []
+    self.styles = []
+    self.panels = []
+    for i in range(0, len(lines)):
+      if isinstance(lines[i], list):
+        self.lines.extend(lines[i])
+        self.styles.extend(style[i])
+        self.panels.extend([i]*len(lines[i]))
+      else:
+        self.lines.append(lines[i])
+        self.styles.append(style[i])
+        self.panels.append(i)
+
+    # Markers at ends of segments drawn by _plot() are replaced on update().
+    self.markers = []
+    for axis in self.axes:
+      for line in axis.lines:
+        if line not in self.lines:
+          self.markers.append(line)
+
+    self._engine = self.fig.get_layout_engine()
+    self._layout_key = None
+
+  def update(self, *args, title=None, xlim=None):
+    """Replace the data of each line; args are t, y or y as for stackplot()
+
+    If title is not None, the titles are replaced.
+    """
+
+    if len(args) < 2:
+      t = None
+      y = args[0]
+    else:
+      t = args[0]
+      y = args[1]
+
+    y = _check_and_expand_y(y)
+    t = _check_and_expand_t(t, y)
+    if not _is_list(y[0]):
+      y = [y]
+
+    tl = []
+    yl = []
+    for i in range(0, len(y)):
+      if _is_list(y[i][0]):
+        tl.extend(t[i])
+        yl.extend(y[i])
+      else:
+        tl.append(t[i])
+        yl.append(y[i])
+
+    if len(y) != len(self.axes) or len(yl) != len(self.lines):
+      raise ValueError(f'y has {len(y)} panels and {len(yl)} traces; expected '
+                       f'{len(self.axes)} panels and {len(self.lines)} traces')
+
+    for marker in self.markers:
+      marker.remove()
+    self.markers = []
+
+    y_min = [np.inf]*len(self.axes)
+    all_int = [True]*len(self.axes)
+    for k in range(0, len(self.lines)):
+      i = self.panels[k]
+      axis = self.axes[i]
+      line = self.lines[k]
+      decimate = self.styles[k].get('decimate', self.decimate)
+      tk, yk, max_gap = _prepare(tl[k], yl[k], axis, self.max_gap, decimate,
+                                 self.max_points, xlim)
+      line.set_data(tk, yk)
+      stats = _stats(yk)
+      if not np.isnan(stats['min']):
+        y_min[i] = min(y_min[i], stats['min'])
+      all_int[i] = all_int[i] and stats['all_int']
+      if max_gap is not None and line.get_marker() == 'None':
+        self.markers.extend(_plot_end_markers(axis, tk, yk, line, stats['nan']))
+
+    from matplotlib.ticker import AutoLocator, MaxNLocator
+    for i in range(0, len(self.axes)):
+      axis = self.axes[i]
+      if all_int[i]:
+        axis.yaxis.set_major_locator(MaxNLocator(integer=True))
+      else:
+        axis.yaxis.set_major_locator(AutoLocator())
+      # _set_ylim() and set_xlim() turned autoscaling off.
+      axis.set_autoscale_on(True)
+      axis.relim()
+      axis.autoscale_view()
+      _set_ylim(axis, y_min[i])
+
+    if title is not None:
+      self.title = title
+      for i in range(0, len(self.axes)):
+        if isinstance(title, list):
+          self.axes[i].set_title(title[i])
+        elif i == 0:
+          self.axes[i].set_title(title)
+
+    if xlim is not None:
+      self.axes[-1].set_xlim(xlim)
+    if self.freeze_layout and self._layout_key is not None:
+      # datetick() draws the figure several times to check for overlapping
+      # labels; use the axes positions from the last layout for these draws.
+      # savefig() solves the layout again if needed.
+      self.fig.set_layout_engine('none')
+    _datetick(self.axes[-1])
+
+  def savefig(self, *args, **kwargs):
+    """Figure.savefig() that reuses the last layout if it is still valid"""
+
+    if self.freeze_layout and self._engine is not None:
+      xlim = self.axes[-1].get_xlim()
+      key = (tuple(axis.get_ylim() for axis in self.axes),
+             round(xlim[1] - xlim[0], 9), repr(self.title))
+      if key == self._layout_key:
+        self.fig.set_layout_engine('none')
+      else:
+        self.fig.set_layout_engine(self._engine)
+        self._layout_key = key
+
+    self.fig.savefig(*args, **kwargs)
@@ -0,0 +1,69 @@
+import os
+import time
+from datetime import timedelta
+
+import numpy as np
+import matplotlib
+
+from stackplot import stackplot
+from layout import StackPlotLayout
+
+os.makedirs('layout_test', exist_ok=True)
+
+rcParams = {'figure.figsize': (8.5, 11), 'figure.dpi': 100,
+            'figure.constrained_layout.use': True}
+
+def day(d):
+  """One day of 1-minute data with a gap"""
+  t = np.datetime64('2000-01-01') + np.timedelta64(d, 'D') + np.arange(1440).astype('timedelta64[m]')
+  rng = np.random.default_rng(d)
+  y1 = 10**d*np.cumsum(rng.standard_normal(1440))
+  y2 = np.cumsum(rng.standard_normal((2, 1440)), axis=1)
+  t = np.delete(t, slice(600, 660))
+  return t, [y1[0:len(t)], [y2[0][0:len(t)], y2[1][0:len(t)]]]
+
+with matplotlib.rc_context(rc=rcParams):
+
+  t, y = day(0)
+  layout = StackPlotLayout(t, y, title='Day 0', max_gap=timedelta(minutes=1),
+                           freeze_layout=True)
+  layout.savefig('layout_test/layout_test_00.png')
+
+  start = time.perf_counter()
+  for d in range(1, 4):
+    t, y = day(d)
+    layout.update(t, y, title=f'Day {d}')
+    layout.savefig(f'layout_test/layout_test_{d:02d}.png')
+    print(f'Wrote layout_test/layout_test_{d:02d}.png')
+  t_layout = (time.perf_counter() - start)/3
+
+  # Limits match those from a new figure
+  fig = stackplot(t, y, title='Day 3', max_gap=timedelta(minutes=1), returnimage=True)
+  for axis, axis_new in zip(layout.axes, fig.axes):
+    assert np.allclose(axis.get_xlim(), axis_new.get_xlim())
+  assert np.allclose(layout.axes[0].get_ylim(), fig.axes[0].get_ylim())
+  # stackplot() sets ylim for a panel with more than one trace using the last
+  # trace; StackPlotLayout uses all traces.
+  ylim = layout.axes[1].get_ylim()
+  assert ylim[0] <= min(np.min(y[1][0]), np.min(y[1][1]))
+  assert ylim[1] >= max(np.max(y[1][0]), np.max(y[1][1]))
+
+  start = time.perf_counter()
+  for d in range(1, 4):
+    t, y = day(d)
+    fig = stackplot(t, y, title=f'Day {d}', max_gap=timedelta(minutes=1), returnimage=True)
+    fig.savefig(f'layout_test/stackplot_{d:02d}.png')
+  t_new = (time.perf_counter() - start)/3
+
+  print(f'StackPlotLayout: {1000*t_layout:.0f} ms per figure; stackplot(): {1000*t_new:.0f} ms per figure')
+
+  # Same interval twice => layout is not solved again
+  layout.update(t, y)
+  layout.savefig('layout_test/layout_test_04.png')
+  assert layout.fig.get_layout_engine().__class__.__name__ == 'PlaceHolderLayoutEngine'
+
+  try:
+    layout.update(t, y[0])
+    assert False
+  except ValueError:
+    pass
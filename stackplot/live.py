@@ -0,0 +1,281 @@
+"""Stack plots that are extended as new data arrive
+
+Usage:
+  from live import LiveStackPlot
+  live = LiveStackPlot(t, y, window=timedelta(hours=6), max_gap=timedelta(minutes=1))
+  ...
+  live.append(t_new, y_new)
+  live.fig.savefig(...)
+
+t and y have the same forms as for stackplot(), and t_new and y_new must have
+the same structure as t and y. Keyword arguments other than window and blit
+are passed to stackplot(); decimate is not supported.
+
+For an interactive window, use blit=True so that after each append only the
+lines are redrawn on top of a cached image of the static parts of the figure
+(axes, grid, tick labels). A full redraw is done only when the axes limits
+change. For example,
+
+  from matplotlib import pyplot as plt
+  live = LiveStackPlot(t, y, window=timedelta(minutes=10), blit=True)
+  plt.show(block=False)
+  while True:
+    t_new, y_new = read_samples()
+    live.append(t_new, y_new)
+    plt.pause(0.01)
+
+When blit=True, the lines are animated artists, which Figure.savefig() does
+not draw; use LiveStackPlot.savefig() instead.
+"""
+import numpy as np
+
+from stackplot import _stackplot, _check_and_expand_y, _check_and_expand_t, _is_list, _insert_nans
+from stackplot import _is_date, _t_to_float, _dt_to_float, _stats, _extract_spectrograms
+from stackplot import _datetick, _set_ylim
+
+class LiveStackPlot:
+
+  def __init__(self, *args, window=None, blit=False, title=None, style=None,
+               max_gap=None, returnimage=False):
+    """Create stack plot and buffers for appending data
+
+    If window is not None, only data with t > t_last - window are kept, where
+    t_last is the last time appended. If blit=True, append() redraws only the
+    lines unless the axes limits changed.
+    """
+
+    if len(args) < 2:
+      t = None
+      y = args[0]
+    else:
+      t = args[0]
+      y = args[1]
+
+    if len(_extract_spectrograms(y)[1]) > 0:
+      raise ValueError('Spectrogram panels are not supported by LiveStackPlot')
+
+    # If t has dates, _plot() converted them to Matplotlib date numbers.
+    # Appended times, window, and max_gap are converted in the same way.
+    leaf = t
+    while leaf is not None and _is_list(leaf[0]):
+      leaf = leaf[0]
+    self.date = leaf is not None and _is_date(leaf)
+    self.window = _dt_to_float(window) if self.date and window is not None else window
+    self.max_gap = _dt_to_float(max_gap, tol=True) if self.date and max_gap is not None else max_gap
+    self.fig, self.axes, lines = _stackplot(t, y, title, style, max_gap,
+                                            None, None, returnimage)
+
+    # Flatten lines to [(panel index, Line2D), ...] in order of traces.
+    self.lines = []
+    for i in range(0, len(lines)):
+      if isinstance(lines[i], list):
+        self.lines.extend([(i, line) for line in lines[i]])
+      else:
+        self.lines.append((i, lines[i]))
+
+    # Remove markers at the ends of segments drawn by _plot(); they would
+    # not be at segment ends after data are appended.
+    traces = [line for _, line in self.lines]
+    for axis in self.axes:
+      for line in list(axis.lines):
+        if line not in traces:
+          line.remove()
+
+    self.buffers = [_Buffer(line.get_xdata(), line.get_ydata()) for _, line in self.lines]
+    self.yrange = [self._yrange(i) for i in range(0, len(self.axes))]
+
+    self.blit = blit
+    self.background = None
+    if blit:
+      canvas = self.fig.canvas
+      if not canvas.supports_blit:
+        raise ValueError(f'Canvas {type(canvas).__name__} does not support blitting')
+      for _, line in self.lines:
+        line.set_animated(True)
+      canvas.mpl_connect('draw_event', self._on_draw)
+
+  def append(self, t, y):
+    """Append data to the end of each trace and update axes limits if needed"""
+
+    y = _check_and_expand_y(y)
+    t = _check_and_expand_t(t, y)
+    if not _is_list(y[0]):
+      y = [y]
+
+    tl = []
+    yl = []
+    for i in range(0, len(y)):
+      if _is_list(y[i][0]):
+        tl.extend(t[i])
+        yl.extend(y[i])
+      else:
+        tl.append(t[i])
+        yl.append(y[i])
+
+    if len(yl) != len(self.buffers):
+      raise ValueError(f'Number of traces appended = {len(yl)} != number of traces plotted = {len(self.buffers)}')
+
+    for k in range(0, len(self.buffers)):
+      buffer = self.buffers[k]
+      tk = np.asarray(tl[k])
+      yk = np.asarray(yl[k])
+      if len(tk) == 0:
+        continue
+      if self.date:
+        tk = _t_to_float(tk)
+      if self.max_gap is not None:
+        # Include last value so a gap between the old and new data is found.
+        if buffer.n > 0:
+          tk = np.concatenate((buffer.t[buffer.n-1:buffer.n], tk))
+          yk = np.concatenate((buffer.y[buffer.n-1:buffer.n], yk))
+          tk, yk = _insert_nans(tk, yk, self.max_gap)
+          tk, yk = tk[1:], yk[1:]
+        else:
+          tk, yk = _insert_nans(tk, yk, self.max_gap)
+      buffer.extend(tk, yk)
+
+    if self.window is not None:
+      t_last = max(buffer.t[buffer.n-1] for buffer in self.buffers if buffer.n > 0)
+      for buffer in self.buffers:
+        buffer.trim(t_last - self.window)
+
+    for k in range(0, len(self.buffers)):
+      self.lines[k][1].set_data(self.buffers[k].t_view(), self.buffers[k].y_view())
+
+    changed = self._update_limits()
+
+    if self.blit:
+      if changed or self.background is None:
+        # Full draw; _on_draw() caches the new background and draws lines.
+        self.fig.canvas.draw()
+      else:
+        self._blit()
+
+  def savefig(self, *args, **kwargs):
+    """Figure.savefig() that includes lines when blit=True"""
+    for _, line in self.lines:
+      line.set_animated(False)
+    try:
+      self.fig.savefig(*args, **kwargs)
+    finally:
+      for _, line in self.lines:
+        line.set_animated(self.blit)
+
+  def _on_draw(self, event):
+    """Cache everything except the lines after a full draw"""
+    canvas = self.fig.canvas
+    self.background = canvas.copy_from_bbox(self.fig.bbox)
+    self._draw_lines()
+
+  def _draw_lines(self):
+    for i, line in self.lines:
+      self.axes[i].draw_artist(line)
+
+  def _blit(self):
+    canvas = self.fig.canvas
+    canvas.restore_region(self.background)
+    self._draw_lines()
+    canvas.blit(self.fig.bbox)
+    canvas.flush_events()
+
+  def _yrange(self, i):
+    """Finite min and max of all traces in panel i"""
+    y_min, y_max = np.inf, -np.inf
+    for k in range(0, len(self.lines)):
+      if self.lines[k][0] == i:
+        y_min = min(y_min, self.buffers[k].y_min)
+        y_max = max(y_max, self.buffers[k].y_max)
+    return y_min, y_max
+
+  def _update_limits(self):
+
+    t_min = min(buffer.t_view()[0] for buffer in self.buffers if len(buffer.t_view()) > 0)
+    t_max = max(buffer.t_view()[-1] for buffer in self.buffers if len(buffer.t_view()) > 0)
+    xlim = self.axes[-1].get_xlim()
+    if self.blit:
+      # Extend xlim by 25% beyond the last time when it is reached so that
+      # most appends do not change xlim and require a full draw.
+      x_min = self.axes[-1].xaxis.convert_units(t_min)
+      x_max = self.axes[-1].xaxis.convert_units(t_max)
+      if x_min < xlim[0] or x_max > xlim[1]:
+        self.axes[-1].set_xlim(x_min, x_max + 0.25*(x_max - x_min))
+    else:
+      self.axes[-1].set_xlim(t_min, t_max)
+    changed = self.axes[-1].get_xlim() != xlim
+    if changed:
+      _datetick(self.axes[-1])
+
+    for i in range(0, len(self.axes)):
+      yrange = self._yrange(i)
+      if yrange != self.yrange[i] and np.all(np.isfinite(yrange)):
+        self.yrange[i] = yrange
+        ylim = self.axes[i].get_ylim()
+        _set_ylim(self.axes[i], *yrange)
+        changed = changed or self.axes[i].get_ylim() != ylim
+
+    return changed
+
+class _Buffer:
+  """Growable t and y arrays
+
+  Capacity is doubled when full so that appending n values takes O(n)
+  amortized time. Values trimmed from the start are discarded when the
+  buffer is next grown or compacted. y_min and y_max are the finite min and
+  max of y_view() (inf and -inf if there are none); they are updated from
+  the appended values and recomputed only when a trim drops one of them.
+  """
+
+  def __init__(self, t, y):
+    t = np.asarray(t)
+    y = np.asarray(y, dtype=float)
+    capacity = max(16, 2*len(t))
+    self.t = np.empty(capacity, dtype=t.dtype)
+    self.y = np.empty(capacity, dtype=float)
+    self.t[0:len(t)] = t
+    self.y[0:len(y)] = y
+    self.start = 0
+    self.n = len(t)
+    self.y_min, self.y_max = np.inf, -np.inf
+    self._update_range(y)
+
+  def extend(self, t, y):
+    n_new = self.n + len(t)
+    if n_new > len(self.t):
+      self._resize(max(2*(n_new - self.start), 16))
+      n_new = self.n + len(t)
+    self.t[self.n:n_new] = t
+    self.y[self.n:n_new] = y
+    self.n = n_new
+    self._update_range(y)
+
+  def trim(self, t_min):
+    """Drop values with t <= t_min"""
+    start = self.start + np.searchsorted(self.t[self.start:self.n], t_min, side='right')
+    dropped = _stats(self.y[self.start:start])
+    self.start = start
+    if dropped['min'] <= self.y_min or dropped['max'] >= self.y_max:
+      self.y_min, self.y_max = np.inf, -np.inf
+      self._update_range(self.y_view())
+    if self.start > len(self.t)//2:
+      self._resize(len(self.t))
+
+  def _update_range(self, y):
+    stats = _stats(y)
+    if not np.isnan(stats['min']):
+      self.y_min = min(self.y_min, stats['min'])
+      self.y_max = max(self.y_max, stats['max'])
+
+  def _resize(self, capacity):
+    t = np.empty(capacity, dtype=self.t.dtype)
+    y = np.empty(capacity, dtype=float)
+    m = self.n - self.start
+    t[0:m] = self.t[self.start:self.n]
+    y[0:m] = self.y[self.start:self.n]
+    self.t, self.y = t, y
+    self.start, self.n = 0, m
+
+  def t_view(self):
+    return self.t[self.start:self.n]
+
+  def y_view(self):
+    return self.y[self.start:self.n]
@@ -0,0 +1,84 @@
+import os
+from datetime import timedelta
+
+import numpy as np
+import matplotlib
+matplotlib.use('Agg')
+
+from live import LiveStackPlot
+
+os.makedirs('live_test', exist_ok=True)
+
+dt = timedelta(minutes=1)
+t0 = np.datetime64('2000-01-01T00:00')
+t = t0 + np.arange(60)*np.timedelta64(1, 'm')
+y = np.vstack((np.sin(np.arange(60)/10.), np.cos(np.arange(60)/10.)))
+
+live = LiveStackPlot(t, [y[0], [y[0], y[1]]], title='LiveStackPlot',
+                     window=timedelta(hours=2), max_gap=dt)
+line = live.lines[0][1]
+ylim = live.axes[0].get_ylim()
+
+for k in range(1, 6):
+  tn = t + k*np.timedelta64(60, 'm')
+  if k == 5:
+    # Gap at start of new data
+    tn = tn[10:]
+    yn = y[:, 10:]
+  else:
+    yn = y
+  live.append(tn, [yn[0], [yn[0], yn[1]]])
+  # Same y range => ylim not changed
+  assert live.axes[0].get_ylim() == ylim
+  live.fig.savefig(f'live_test/live_test_{k:02d}.png')
+  print(f'Wrote live_test/live_test_{k:02d}.png')
+
+td = line.get_xdata()
+yd = line.get_ydata()
+assert td[-1] - td[0] < 2/24. # xdata are Matplotlib date numbers (days)
+assert np.any(np.isnan(yd)) # NaN from gap
+
+# New range => ylim changed
+live.append(tn[-1:] + np.timedelta64(1, 'm'), [[10.], [[10.], [10.]]])
+assert live.axes[0].get_ylim()[1] >= 10
+live.fig.savefig('live_test/live_test_06.png')
+print('Wrote live_test/live_test_06.png')
+
+def check_limits(live):
+  """Running range of each trace and ylim are those for the data in the window"""
+  from stackplot import stackplot
+  for buffer in live.buffers:
+    assert buffer.y_min == np.nanmin(buffer.y_view())
+    assert buffer.y_max == np.nanmax(buffer.y_view())
+  b = live.buffers
+  fig = stackplot(b[0].t_view(), [b[0].y_view(), [b[1].y_view(), b[2].y_view()]],
+                  returnimage=True)
+  for i in range(0, len(live.axes)):
+    assert live.axes[i].get_ylim() == fig.axes[i].get_ylim(), i
+
+check_limits(live)
+
+# The value 10 is trimmed => range and ylim computed again
+live.append(tn + np.timedelta64(3, 'h'), [yn[0], [yn[0], yn[1]]])
+assert live.buffers[0].y_max < 10
+check_limits(live)
+
+# Blitting; only the first append and appends that change the limits do a
+# full draw. The others only redraw the lines.
+live = LiveStackPlot(t, [y[0], [y[0], y[1]]], title='LiveStackPlot, blit=True',
+                     blit=True, max_gap=dt)
+n_blit = [0]
+_blit = live._blit
+def _count_blit():
+  n_blit[0] += 1
+  _blit()
+live._blit = _count_blit
+for k in range(0, 60):
+  tn = t[-1:] + (k + 1)*np.timedelta64(1, 'm')
+  yn = y[:, k:k+1]
+  live.append(tn, [yn[0], [yn[0], yn[1]]])
+print(f'blit=True: {60 - n_blit[0]} full draws for 60 appends')
+assert n_blit[0] > 50
+assert len(live.lines[0][1].get_xdata()) == 120
+live.savefig('live_test/live_test_07.png')
+print('Wrote live_test/live_test_07.png')
@@ -0,0 +1,177 @@
+"""Multi-resolution summaries of long time series for fast zoomed-out plots
+
+Usage:
+  from pyramid import build_pyramid, Pyramid, stackplot_pyramids
+  build_pyramid(t, y, 'bz.pyramid')       # Once
+  build_pyramid(t, y2, 'symh.pyramid')
+  ...
+  pyramids = [Pyramid('bz.pyramid'), Pyramid('symh.pyramid')]
+  fig = stackplot_pyramids(pyramids, start, stop, max_gap=timedelta(minutes=5))
+
+Level 0 is the original data. Level k >= 1 has one value for each group of
+2**k consecutive values of level 0: the time of the first value and the
+min, max, sum, and number of non-NaN values in the group. Each level is
+computed from the one before it, so building takes O(N) time and the
+levels together take about twice the space of the data. Levels are saved
+as .npy files in a directory and are read with memory maps.
+
+To plot [start, stop) at a width of n pixels, Pyramid.select() uses the
+finest level with at most 2*n vertices in [start, stop), so the amount of
+data read and plotted does not depend on the length of the original data.
+"""
+import os
+import json
+
+import numpy as np
+
+from stackplot import stackplot, _insert_nans, _dt_to_float, _as_type
+
+def build_pyramid(t, y, directory):
+  """Compute summaries of y at power-of-two resolutions and save to directory
+
+  t must be sorted. t may be numeric, datetime64, or datetime; datetimes are
+  stored as datetime64[ns].
+  """
+
+  t = np.asarray(t)
+  if t.dtype == object:
+    t = t.astype('datetime64[ns]')
+  y = np.asarray(y, dtype=float)
+  if len(t) != len(y):
+    raise ValueError(f'len(t) = {len(t)} != len(y) = {len(y)}')
+
+  os.makedirs(directory, exist_ok=True)
+  np.save(os.path.join(directory, '0_t.npy'), t)
+  np.save(os.path.join(directory, '0_y.npy'), y)
+
+  nan = np.isnan(y)
+  level = {
+            't': t,
+            'min': y,
+            'max': y,
+            'sum': np.where(nan, 0., y),
+            'count': (~nan).astype(np.int64)
+          }
+  spacing = [_median_spacing(t)]
+  k = 0
+  while len(level['t']) > 1:
+    k += 1
+    starts = np.arange(0, len(level['t']), 2)
+    level = {
+              't': level['t'][starts],
+              'min': np.fmin.reduceat(level['min'], starts),
+              'max': np.fmax.reduceat(level['max'], starts),
+              'sum': np.add.reduceat(level['sum'], starts),
+              'count': np.add.reduceat(level['count'], starts)
+            }
+    for key, value in level.items():
+      np.save(os.path.join(directory, f'{k}_{key}.npy'), value)
+    spacing.append(_median_spacing(level['t']))
+
+  meta = {'levels': k + 1, 'n': len(t), 'spacing': spacing}
+  with open(os.path.join(directory, 'meta.json'), 'w') as f:
+    json.dump(meta, f)
+
+def _median_spacing(t):
+  """Median of diff(t) as a float (days for datetime64)"""
+  if len(t) < 2:
+    return 0.
+  dt = np.median(np.diff(t[0:min(len(t), 100000)]))
+  return float(_dt_to_float(dt))
+
+class Pyramid:
+  """Summaries saved by build_pyramid()"""
+
+  def __init__(self, directory):
+    self.directory = directory
+    with open(os.path.join(directory, 'meta.json')) as f:
+      self.meta = json.load(f)
+    self._arrays = {}
+
+  def _array(self, k, key):
+    name = f'{k}_{key}'
+    if name not in self._arrays:
+      file = os.path.join(self.directory, name + '.npy')
+      self._arrays[name] = np.load(file, mmap_mode='r')
+    return self._arrays[name]
+
+  def select(self, start=None, stop=None, n=1000, kind='minmax', max_gap=None):
+    """Return t, y to plot for start <= t < stop at a width of n pixels
+
+    kind='minmax' returns the min and max of each group in time order (two
+    values per group); kind='mean' returns the mean of each group. One group
+    before start and one after stop are included so lines extend to the
+    edges of the plot. If max_gap is not None, NaNs are inserted where the
+    data have gaps longer than max_gap. The level used is stored in
+    self.level.
+    """
+
+    if kind not in ['minmax', 'mean']:
+      raise ValueError(f"kind = {kind} must be 'minmax' or 'mean'")
+
+    for k in range(0, self.meta['levels']):
+      t = self._array(k, 't')
+      lo = 0 if start is None else np.searchsorted(t, _as_type(start, t), side='left')
+      hi = len(t) if stop is None else np.searchsorted(t, _as_type(stop, t), side='left')
+      n_vertices = (hi - lo) if k == 0 else 2*(hi - lo)
+      if n_vertices <= 2*n or k == self.meta['levels'] - 1:
+        break
+
+    lo = max(lo - 1, 0)
+    hi = min(hi + 1, len(t))
+    t = t[lo:hi]
+
+    if k == 0:
+      y = self._array(0, 'y')[lo:hi]
+    elif kind == 'mean':
+      count = self._array(k, 'count')[lo:hi]
+      with np.errstate(invalid='ignore', divide='ignore'):
+        y = self._array(k, 'sum')[lo:hi]/count
+    else:
+      y_min = self._array(k, 'min')[lo:hi]
+      y_max = self._array(k, 'max')[lo:hi]
+      # The order of the min and max within a group is not stored, so the
+      # min is put first.
+      t = np.repeat(t, 2)
+      y = np.empty(2*len(y_min))
+      y[0::2] = y_min
+      y[1::2] = y_max
+
+    self.level = k
+
+    if max_gap is not None:
+      # Times of groups at level k differ by about spacing[k] when there
+      # is no gap.
+      gap = _dt_to_float(max_gap)
+      if k > 0:
+        gap = gap + self.meta['spacing'][k]
+      if np.issubdtype(t.dtype, np.datetime64):
+        gap = np.timedelta64(int(round(gap*86400e9)), 'ns')
+      t, y = _insert_nans(t, y, gap)
+
+    return t, y
+
+def stackplot_pyramids(pyramids, start=None, stop=None, n=None, kind='minmax',
+                       max_gap=None, **kwargs):
+  """Stack plot with one panel per Pyramid
+
+  n is the panel width in pixels and defaults to the figure width from
+  rcParams. kwargs are passed to stackplot(). If start and stop are given,
+  they are used for the default of xlim.
+  """
+
+  if start is not None and stop is not None:
+    kwargs.setdefault('xlim', (start, stop))
+
+  if n is None:
+    import matplotlib
+    n = int(matplotlib.rcParams['figure.figsize'][0]*matplotlib.rcParams['figure.dpi'])
+
+  t = []
+  y = []
+  for pyramid in pyramids:
+    tp, yp = pyramid.select(start, stop, n=n, kind=kind, max_gap=max_gap)
+    t.append(tp)
+    y.append(yp)
+
+  return stackplot(t, y, **kwargs)
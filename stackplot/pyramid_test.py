@@ -0,0 +1,58 @@
+import os
+import time
+import shutil
+import tempfile
+from datetime import timedelta
+
+import numpy as np
+import matplotlib
+
+from pyramid import build_pyramid, Pyramid, stackplot_pyramids
+
+os.makedirs('pyramid_test', exist_ok=True)
+tmp = tempfile.mkdtemp()
+try:
+  # One year of 1-minute data with a spike and a one-day gap
+  t = np.arange('2000-01-01', '2001-01-01', dtype='datetime64[m]').astype('datetime64[ns]')
+  y = np.sin(2*np.pi*np.arange(len(t))/(27*1440)) + 0.1*np.random.randn(len(t))
+  y[200000] = 10
+  t = np.delete(t, slice(300000, 301440))
+  y = np.delete(y, slice(300000, 301440))
+
+  start = time.perf_counter()
+  build_pyramid(t, y, os.path.join(tmp, 'y.pyramid'))
+  print(f'build_pyramid(): {time.perf_counter() - start:.2f} s for {len(t)} values')
+
+  pyramid = Pyramid(os.path.join(tmp, 'y.pyramid'))
+
+  # Year view
+  start = time.perf_counter()
+  tp, yp = pyramid.select(n=1000)
+  print(f'select(): {1000*(time.perf_counter() - start):.1f} ms; level = {pyramid.level}; {len(tp)} values')
+  assert len(tp) <= 2*1000 + 4
+  assert np.nanmax(yp) == 10 and np.nanmin(yp) == np.min(y)
+
+  # Mean summaries
+  tp, yp = pyramid.select(n=1000, kind='mean')
+  assert abs(np.nanmean(yp) - np.mean(y)) < 0.05
+
+  # One-hour view uses original data
+  tp, yp = pyramid.select(np.datetime64('2000-02-01T00'), np.datetime64('2000-02-01T01'), n=1000)
+  assert pyramid.level == 0 and len(tp) == 62
+
+  # Gap is kept at coarse levels; no other NaNs are inserted
+  tp, yp = pyramid.select(np.datetime64('2000-07-01'), np.datetime64('2000-08-01'),
+                          n=1000, max_gap=timedelta(minutes=1))
+  assert pyramid.level > 0
+  assert 1 <= np.count_nonzero(np.isnan(yp)) <= 2
+
+  rcParams = {'figure.figsize': (8.5, 11), 'figure.dpi': 150}
+  with matplotlib.rc_context(rc=rcParams):
+    start = time.perf_counter()
+    fig = stackplot_pyramids([pyramid, pyramid], max_gap=timedelta(minutes=1),
+                             title='stackplot_pyramids()', returnimage=True)
+    fig.savefig('pyramid_test/pyramid_test_01.png')
+    print(f'stackplot_pyramids(): {time.perf_counter() - start:.2f} s')
+  print('Wrote pyramid_test/pyramid_test_01.png')
+finally:
+  shutil.rmtree(tmp)
@@ -0,0 +1,230 @@
+"""Cache of rendered stack plot and time series images
+
+Usage:
+  from render_cache import RenderCache, cached_stackplot, cached_timeseries
+  cache = RenderCache(max_size=2**28)                 # In memory
+  cache = RenderCache(directory='~/.cache/stackplot') # On disk
+  png = cached_stackplot(t, y, cache=cache, title=title, max_gap=max_gap)
+  svg = cached_timeseries(t, y, cache=cache, format='svg', title=title)
+
+The key for an image is a digest of the function name, the image format,
+the arguments, and the current Matplotlib rcParams. Arrays are hashed from
+their data buffers, so computing a key takes much less time than rendering.
+On a hit, the stored bytes are returned without creating a figure. When the
+total size of the stored images exceeds max_size bytes, the least recently
+used images are removed. With a directory, images are saved as files and
+so are shared by processes and kept after a process exits.
+
+Spectrogram panels are hashed from their values and options, and
+Matplotlib colormaps and norms from their colors and parameters. An
+argument of another type whose repr() includes its memory address (e.g.,
+'<... object at 0x...>') cannot be hashed from its contents; the image is
+then rendered and not stored.
+"""
+import os
+import re
+import sys
+import hashlib
+import logging
+import datetime
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from cache_files import write, evict
+
+max_size_default = 2**28 # bytes
+
+class RenderCache:
+  """Images keyed by a digest of the inputs used to render them"""
+
+  def __init__(self, max_size=max_size_default, directory=None):
+    self.max_size = max_size
+    self.directory = None if directory is None else os.path.expanduser(directory)
+    self.hits = 0
+    self.misses = 0
+    self._images = OrderedDict()
+    self._size = 0
+    self._lock = threading.Lock()
+    if self.directory is not None:
+      os.makedirs(self.directory, exist_ok=True)
+
+  def get(self, key):
+    """Image bytes for key or None"""
+
+    if self.directory is not None:
+      file = self._file(key)
+      try:
+        with open(file, 'rb') as f:
+          image = f.read()
+        os.utime(file) # Mark as recently used
+      except FileNotFoundError:
+        image = None
+    else:
+      with self._lock:
+        image = self._images.get(key)
+        if image is not None:
+          self._images.move_to_end(key)
+
+    if image is None:
+      self.misses += 1
+    else:
+      self.hits += 1
+    return image
+
+  def put(self, key, image):
+
+    if self.directory is not None:
+      write(self._file(key), lambda f: f.write(image))
+      evict(self.directory, self.max_size, '.img')
+      return
+
+    with self._lock:
+      if key in self._images:
+        self._size -= len(self._images.pop(key))
+      self._images[key] = image
+      self._size += len(image)
+      while self._size > self.max_size and len(self._images) > 0:
+        _, removed = self._images.popitem(last=False)
+        self._size -= len(removed)
+
+  def clear(self):
+    with self._lock:
+      self._images.clear()
+      self._size = 0
+    if self.directory is not None:
+      for name in os.listdir(self.directory):
+        if name.endswith('.img'):
+          os.remove(os.path.join(self.directory, name))
+
+  def _file(self, key):
+    return os.path.join(self.directory, key + '.img')
+
+def cached_stackplot(*args, cache=None, format='png', **kwargs):
+  """stackplot(*args, returnimage=format, **kwargs) using cache
+
+  Returns the image bytes. If cache is None, the image is rendered and not
+  stored.
+  """
+
+  def render():
+    from stackplot import stackplot
+    return stackplot(*args, returnimage=format, **kwargs)
+
+  return _cached(cache, 'stackplot', format, args, kwargs, render)
+
+def cached_timeseries(t, y, cache=None, format='png', **kwargs):
+  """timeseries(t, y, returnimage=True, **kwargs) saved to bytes using cache"""
+
+  def render():
+    import io
+    from timeseries import timeseries
+    fig = timeseries(t, y, returnimage=True, **kwargs)
+    buf = io.BytesIO()
+    fig.savefig(buf, format=format)
+    return buf.getvalue()
+
+  return _cached(cache, 'timeseries', format, (t, y), kwargs, render)
+
+def _cached(cache, name, format, args, kwargs, render):
+
+  if cache is None:
+    return render()
+
+  try:
+    key = render_key(name, format, args, kwargs)
+  except UnhashableError as e:
+    logging.getLogger('stackplot').debug('Image not cached: %s', e)
+    return render()
+  image = cache.get(key)
+  if image is None:
+    image = render()
+    cache.put(key, image)
+  return image
+
+class UnhashableError(TypeError):
+  """An argument cannot be hashed from its contents"""
+
+def render_key(*args):
+  """Hex digest of args and the current Matplotlib rcParams
+
+  Raises UnhashableError if an argument is an object whose repr() includes
+  its memory address.
+  """
+  import matplotlib
+  h = hashlib.blake2b(digest_size=20)
+  _update(h, args)
+  # Only the rcParams, not how they were set (rc_context, style, etc.),
+  # affect the image.
+  _update(h, sorted((k, repr(v)) for k, v in matplotlib.rcParams.items()))
+  return h.hexdigest()
+
+def _update(h, x):
+  """Add x to hash h
+
+  Type names are included so that, e.g., [1, 2] and (1, 2) or 1 and 1.0
+  give different digests.
+  """
+
+  if isinstance(x, np.ndarray):
+    if x.dtype == object:
+      try:
+        # Usually an array of datetimes
+        x = x.astype('datetime64[us]')
+      except (TypeError, ValueError):
+        h.update(b'object')
+        _update(h, x.tolist())
+        return
+    h.update(f'ndarray{x.dtype.str}{x.shape}'.encode())
+    # view() cannot change the itemsize of a 0-d array.
+    h.update(np.ascontiguousarray(np.atleast_1d(x)).view(np.uint8).data)
+  elif isinstance(x, (list, tuple)):
+    if len(x) > 0 and isinstance(x[0], (int, float, datetime.datetime)):
+      # Long lists of scalars are hashed as arrays.
+      try:
+        a = np.asarray(x)
+        if a.dtype == object:
+          a = a.astype('datetime64[us]')
+      except (TypeError, ValueError):
+        a = None
+      if a is not None and a.dtype.kind in 'biufcM':
+        h.update(type(x).__name__.encode())
+        _update(h, a)
+        return
+    h.update(f'{type(x).__name__}{len(x)}('.encode())
+    for element in x:
+      _update(h, element)
+    h.update(b')')
+  elif isinstance(x, dict):
+    h.update(f'dict{len(x)}('.encode())
+    for key in sorted(x, key=repr):
+      _update(h, key)
+      _update(h, x[key])
+    h.update(b')')
+  elif _isinstance(x, 'stackplot', 'Spectrogram'):
+    h.update(b'Spectrogram(')
+    _update(h, [x.z, x.channels, x.cmap, x.norm, x.vmin, x.vmax, x.clabel, x.ylog])
+    h.update(b')')
+  elif _isinstance(x, 'matplotlib.colors', 'Colormap'):
+    h.update(f'{type(x).__name__}:{x.name}('.encode())
+    _update(h, [x(np.linspace(0, 1, x.N)), x.get_under(), x.get_over(), x.get_bad()])
+    h.update(b')')
+  elif _isinstance(x, 'matplotlib.colors', 'Normalize'):
+    # vmin, vmax, clip, and parameters of subclasses, e.g., gamma of PowerNorm
+    params = {k: v for k, v in vars(x).items()
+              if isinstance(v, (bool, int, float, str, type(None), np.number))}
+    h.update(f'{type(x).__name__}('.encode())
+    _update(h, params)
+    h.update(b')')
+  else:
+    r = repr(x)
+    if re.search(r' at 0x[0-9a-fA-F]+', r):
+      raise UnhashableError(f'repr() of {type(x).__name__} includes its address: {r}')
+    h.update(f'{type(x).__name__}:{r};'.encode())
+
+def _isinstance(x, module, name):
+  """isinstance(x, module.name) without importing module"""
+  # If module is not imported, x cannot be an instance of one of its classes.
+  m = sys.modules.get(module)
+  return m is not None and isinstance(x, getattr(m, name))
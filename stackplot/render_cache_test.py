@@ -0,0 +1,112 @@
+import os
+import time
+import shutil
+import tempfile
+from datetime import datetime, timedelta
+
+import numpy as np
+import matplotlib
+
+from stackplot import Spectrogram
+from render_cache import RenderCache, cached_stackplot, cached_timeseries, render_key
+from render_cache import UnhashableError
+
+t = np.arange('2000-01-01', '2000-01-08', dtype='datetime64[m]')
+y = np.sin(np.arange(len(t))/1000.)
+
+# Keys depend on data, style, and rcParams
+key = render_key('stackplot', 'png', (t, [y, y]), {'title': 'A'})
+assert key == render_key('stackplot', 'png', (t.copy(), [y.copy(), y]), {'title': 'A'})
+assert key != render_key('stackplot', 'png', (t, [y, y + 1]), {'title': 'A'})
+assert key != render_key('stackplot', 'png', (t, [y, y]), {'title': 'B'})
+assert key != render_key('stackplot', 'svg', (t, [y, y]), {'title': 'A'})
+with matplotlib.rc_context(rc={'figure.dpi': 50}):
+  assert key != render_key('stackplot', 'png', (t, [y, y]), {'title': 'A'})
+assert render_key([1, 2]) != render_key((1, 2))
+assert render_key([1, 2]) != render_key([1., 2.])
+assert render_key([1, '1']) != render_key(['1', '1'])
+# 0-d arrays
+assert render_key(np.array(1.5)) == render_key(np.array(1.5))
+assert render_key(np.array(1.5)) != render_key(np.array(2.5))
+assert render_key(np.array(1.5)) != render_key(np.array([1.5]))
+assert render_key(np.array(datetime(2000, 1, 1), dtype=object)) != render_key(np.array(datetime(2000, 1, 2), dtype=object))
+dates = [datetime(2000, 1, 1) + timedelta(hours=i) for i in range(10)]
+assert render_key(dates) == render_key(list(dates))
+assert render_key(dates) != render_key(dates[0:-1] + [dates[-1] + timedelta(seconds=1)])
+
+# Spectrograms are hashed by their values and options, not their address
+keys = set()
+for k in range(5):
+  keys.add(render_key((t, Spectrogram(np.full((len(t), 3), k)))))
+assert len(keys) == 5
+z = np.random.rand(len(t), 3)
+assert render_key(Spectrogram(z)) == render_key(Spectrogram(z.copy()))
+assert render_key(Spectrogram(z, channels=[1, 10, 100])) != render_key(Spectrogram(z, channels=[1, 10, 100], ylog=True))
+assert render_key(Spectrogram(z)) != render_key(Spectrogram(z, channels=[1, 2, 3]))
+assert render_key(Spectrogram(z, cmap='viridis')) != render_key(Spectrogram(z, cmap='magma'))
+from matplotlib.colors import LogNorm, PowerNorm
+import matplotlib.cm
+assert render_key(LogNorm(1, 10)) == render_key(LogNorm(1, 10))
+assert render_key(LogNorm(1, 10)) != render_key(LogNorm(1, 100))
+assert render_key(PowerNorm(0.5)) != render_key(PowerNorm(2))
+assert render_key(matplotlib.colormaps['viridis']) != render_key(matplotlib.colormaps['magma'])
+
+# Objects hashed by address are not cached
+try:
+  render_key(object())
+  assert False
+except UnhashableError:
+  pass
+unhashable = RenderCache()
+cached_stackplot(t, y, cache=unhashable, style={'color': 'k'})
+class Color(str):
+  def __repr__(self):
+    return object.__repr__(self)
+cached_stackplot(t, y, cache=unhashable, style={'color': Color('k')})
+assert unhashable.hits == 0 and len(unhashable._images) == 1
+
+# In-memory cache
+cache = RenderCache()
+start = time.perf_counter()
+png1 = cached_stackplot(t, [y, y], cache=cache, title='A')
+t_miss = time.perf_counter() - start
+start = time.perf_counter()
+png2 = cached_stackplot(t, [y, y], cache=cache, title='A')
+t_hit = time.perf_counter() - start
+print(f'cached_stackplot(): miss {1000*t_miss:.1f} ms; hit {1000*t_hit:.1f} ms')
+assert png1 == png2 and png1[0:8] == b'\x89PNG\r\n\x1a\n'
+assert cache.hits == 1 and cache.misses == 1
+
+svg = cached_stackplot(t, [y, y], cache=cache, format='svg', title='A')
+assert b'<svg' in svg[0:1000] and cache.misses == 2
+
+png3 = cached_timeseries(t, y, cache=cache, title='A')
+png4 = cached_timeseries(t, y, cache=cache, title='A')
+assert png3 == png4 and cache.misses == 3 and cache.hits == 2
+
+# LRU eviction by size; png1 is least recently used
+small = RenderCache(max_size=len(png1) + len(png3))
+cached_stackplot(t, [y, y], cache=small, title='A')
+cached_timeseries(t, y, cache=small, title='A')
+cached_timeseries(t, y + 1, cache=small, title='A')
+assert len(small._images) <= 2 and small._size <= small.max_size
+cached_stackplot(t, [y, y], cache=small, title='A')
+assert small.misses == 4
+
+# Disk cache is kept across RenderCache instances
+directory = tempfile.mkdtemp()
+try:
+  disk = RenderCache(directory=directory)
+  png5 = cached_stackplot(t, [y, y], cache=disk, title='A')
+  disk = RenderCache(directory=directory)
+  png6 = cached_stackplot(t, [y, y], cache=disk, title='A')
+  assert png5 == png6 and disk.hits == 1 and disk.misses == 0
+  assert len(os.listdir(directory)) == 1
+
+  disk = RenderCache(directory=directory, max_size=1)
+  cached_stackplot(t, [y, y + 1], cache=disk, title='A')
+  assert len(os.listdir(directory)) == 0
+finally:
+  shutil.rmtree(directory)
+
+print('render_cache_test.py passed')
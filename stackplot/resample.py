@@ -0,0 +1,247 @@
+"""Resample time series onto a regular time grid
+
+Usage:
+  from resample import resample, align, Resampler
+  t1, y1 = resample(t, y, timedelta(minutes=1), method='mean')
+  t, ys = align([t_mag, t_omni, t_dst], [b, v, dst], timedelta(minutes=5))
+
+  # Input that does not fit in memory, one chunk at a time
+  resampler = Resampler(timedelta(minutes=1), method='max')
+  for t_chunk, y_chunk in chunks:
+    t1, y1 = resampler.update(t_chunk, y_chunk)
+    ...
+  t1, y1 = resampler.finish()
+
+Bin k is [origin + k*cadence, origin + (k + 1)*cadence), where origin is
+start if given and otherwise 0 (1970-01-01 for datetimes), so the grids of
+series with the same cadence are aligned. The time of a bin is its start.
+The value of a bin is the mean, min, max, or last of the non-NaN values in
+it, or NaN if there are none. All bins from the first (or start) to the
+last (or stop) are returned, so the grid has no gaps.
+
+t must be sorted and may be numeric, datetime64, or datetime; datetimes are
+returned as datetime64. y may be 1-D or 2-D with time along the first axis.
+Bin indices are computed with integer division (exact for datetime64) and
+the values of each bin are reduced with np.add.reduceat, np.fmin.reduceat,
+etc., so no Python loop runs over values or bins. A Resampler keeps only the
+statistics of the last bin between chunks.
+"""
+import numpy as np
+
+methods = ['mean', 'min', 'max', 'last']
+
+class Resampler:
+  """Resample a time series given as a sequence of sorted chunks"""
+
+  def __init__(self, cadence, method='mean', start=None, stop=None):
+
+    if method not in methods:
+      raise ValueError(f'method = {method} must be one of {methods}')
+    self.cadence = cadence
+    self.method = method
+    self.start = start
+    self.stop = stop
+    self._dtype = None  # datetime64 dtype of bin times or float
+    self._shape = ()    # Shape of one value of y
+    self._next = None   # Index of the next bin to return
+    self._open = None   # (index, statistics) of the last bin seen
+
+  def update(self, t, y):
+    """Add a chunk; returns t, y of the bins that are complete
+
+    The last bin with values in the chunk may continue in the next chunk,
+    so it is returned by a later update() or by finish().
+    """
+
+    k, y = self._bins(t, y)
+    if len(k) == 0:
+      return self._fill(k, np.empty((0,) + self._shape), self._next or 0)
+
+    bins, stats = _reduce(k, y, self.method)
+    if self._open is not None:
+      k_open, stats_open = self._open
+      if bins[0] < k_open:
+        raise ValueError('t of a chunk is before t of the previous chunk')
+      if bins[0] == k_open:
+        first = _merge(stats_open, tuple(s[0:1] for s in stats), self.method)
+        stats = tuple(np.concatenate((f, s[1:])) for f, s in zip(first, stats))
+      else:
+        bins = np.concatenate(([k_open], bins))
+        stats = tuple(np.concatenate((o, s)) for o, s in zip(stats_open, stats))
+
+    self._open = (bins[-1], tuple(s[-1:] for s in stats))
+    values = _value(tuple(s[:-1] for s in stats), self.method)
+    return self._fill(bins[:-1], values, bins[-1])
+
+  def finish(self):
+    """Return t, y of the remaining bins (through stop, if given)"""
+
+    end = self._next or 0
+    if self._open is None:
+      bins = np.empty(0, dtype=np.int64)
+      values = np.empty((0,) + self._shape)
+    else:
+      bins = np.array([self._open[0]])
+      values = _value(self._open[1], self.method)
+      end = bins[0] + 1
+    if self.stop is not None and self._dtype is not None:
+      end = max(end, self._index(self.stop, ceil=True))
+    self._open = None
+    return self._fill(bins, values, end)
+
+  def _bins(self, t, y):
+    """Bin index of each value in [start, stop) and the values as floats"""
+
+    t = np.asarray(t)
+    y = np.asarray(y)
+    if len(t) != len(y):
+      raise ValueError(f'len(t) = {len(t)} != len(y) = {len(y)}')
+    if y.dtype.kind != 'f':
+      y = y.astype(float)
+    self._shape = y.shape[1:]
+
+    if t.dtype == object:
+      t = t.astype('datetime64[us]')
+    if self._dtype is None:
+      if np.issubdtype(t.dtype, np.datetime64):
+        cadence = np.timedelta64(self.cadence)
+        unit = np.datetime_data(cadence.dtype)[0]
+        self._dtype = np.promote_types(t.dtype, np.dtype(f'datetime64[{unit}]'))
+        self._c = int(cadence.astype(f'timedelta64[{np.datetime_data(self._dtype)[0]}]').astype(np.int64))
+        self._origin = 0 if self.start is None else int(np.datetime64(self.start).astype(self._dtype).astype(np.int64))
+      else:
+        self._dtype = np.dtype(float)
+        self._c = float(self.cadence)
+        self._origin = 0. if self.start is None else float(self.start)
+      if self._c <= 0:
+        raise ValueError(f'cadence = {self.cadence} must be positive')
+
+    if self._dtype == float:
+      k = np.floor((t.astype(float, copy=False) - self._origin)/self._c).astype(np.int64)
+    else:
+      k = (t.astype(self._dtype, copy=False).astype(np.int64) - self._origin)//self._c
+
+    lo = 0 if self.start is None else np.searchsorted(k, 0, side='left')
+    hi = len(k)
+    if self.stop is not None:
+      hi = np.searchsorted(k, self._index(self.stop, ceil=True), side='left')
+    return k[lo:hi], y[lo:hi]
+
+  def _index(self, value, ceil=False):
+    """Index of the bin that contains value or, if ceil=True, the first bin at or after value"""
+    if self._dtype == float:
+      x = (float(value) - self._origin)/self._c
+      return int(np.ceil(x) if ceil else np.floor(x))
+    d = int(np.datetime64(value).astype(self._dtype).astype(np.int64)) - self._origin
+    return -(-d//self._c) if ceil else d//self._c
+
+  def _fill(self, bins, values, end):
+    """Bin times and values of bins [next, end) with NaN for bins with no values"""
+
+    if self._next is None:
+      if self.start is not None:
+        self._next = 0
+      elif len(bins) > 0:
+        self._next = int(bins[0])
+      else:
+        return self._times(np.empty(0, dtype=np.int64)), np.empty((0,) + self._shape)
+    first = self._next
+    end = max(int(end), first)
+    y = np.full((end - first,) + self._shape, np.nan)
+    y[bins - first] = values
+    self._next = end
+    return self._times(np.arange(first, end)), y
+
+  def _times(self, k):
+    if self._dtype is None:
+      return k.astype(float)
+    if self._dtype == float:
+      return self._origin + k*self._c
+    return (self._origin + k*self._c).astype(np.int64).view(self._dtype)
+
+def _reduce(k, y, method):
+  """Indices of the bins with values and statistics of each for sorted k"""
+
+  starts = np.concatenate(([0], np.flatnonzero(np.diff(k)) + 1))
+  nan = np.isnan(y)
+  if method == 'mean':
+    stats = (np.add.reduceat(np.where(nan, 0., y), starts, axis=0),
+             np.add.reduceat((~nan).astype(np.int64), starts, axis=0))
+  elif method == 'min':
+    stats = (np.fmin.reduceat(y, starts, axis=0),)
+  elif method == 'max':
+    stats = (np.fmax.reduceat(y, starts, axis=0),)
+  else:
+    # Index of the last non-NaN value in each bin, or -1
+    index = np.arange(len(y)).reshape((-1,) + (1,)*(y.ndim - 1))
+    last = np.maximum.reduceat(np.where(nan, -1, index), starts, axis=0)
+    value = np.take_along_axis(y, np.maximum(last, 0), axis=0)
+    stats = (np.where(last < 0, np.nan, value),)
+  return k[starts], stats
+
+def _merge(a, b, method):
+  """Statistics of one bin from statistics a and b of values in the bin"""
+  if method == 'mean':
+    return (a[0] + b[0], a[1] + b[1])
+  if method == 'min':
+    return (np.fmin(a[0], b[0]),)
+  if method == 'max':
+    return (np.fmax(a[0], b[0]),)
+  return (np.where(np.isnan(b[0]), a[0], b[0]),)
+
+def _value(stats, method):
+  if method == 'mean':
+    with np.errstate(invalid='ignore', divide='ignore'):
+      return stats[0]/stats[1]
+  return stats[0]
+
+def resample(t, y, cadence, method='mean', start=None, stop=None):
+  """Resample y onto bins of width cadence; returns bin times and values"""
+
+  resampler = Resampler(cadence, method=method, start=start, stop=stop)
+  t1, y1 = resampler.update(t, y)
+  t2, y2 = resampler.finish()
+  return np.concatenate((t1, t2)), np.concatenate((y1, y2))
+
+def resample_chunks(chunks, cadence, method='mean', start=None, stop=None):
+  """Resample an iterable of (t, y) chunks; yields (t, y) of complete bins"""
+
+  resampler = Resampler(cadence, method=method, start=start, stop=stop)
+  for t, y in chunks:
+    t1, y1 = resampler.update(t, y)
+    if len(t1) > 0:
+      yield t1, y1
+  t1, y1 = resampler.finish()
+  if len(t1) > 0:
+    yield t1, y1
+
+def align(t, y, cadence, method='mean', start=None, stop=None):
+  """Resample each of the series t[i], y[i] onto one grid
+
+  Returns the bin times and a list with the values of each series; bins
+  outside of the time range of a series are NaN.
+  """
+
+  if len(t) != len(y):
+    raise ValueError(f'len(t) = {len(t)} != len(y) = {len(y)}')
+
+  results = [resample(ti, yi, cadence, method=method, start=start, stop=stop)
+             for ti, yi in zip(t, y)]
+  nonempty = [ti for ti, _ in results if len(ti) > 0]
+  if len(nonempty) == 0:
+    return results[0][0] if len(results) > 0 else np.empty(0), [yi for _, yi in results]
+
+  t0 = min(ti[0] for ti in nonempty)
+  t1 = max(ti[-1] for ti in nonempty)
+  step = np.timedelta64(cadence) if np.issubdtype(t0.dtype, np.datetime64) else cadence
+  n = int(round((t1 - t0)/step)) + 1
+  grid = t0 + np.arange(n)*step
+
+  ys = []
+  for ti, yi in results:
+    out = np.full((n,) + yi.shape[1:], np.nan)
+    if len(ti) > 0:
+      offset = int(round((ti[0] - t0)/step))
+      out[offset:offset + len(yi)] = yi
+    ys.append(out)
+  return grid, ys
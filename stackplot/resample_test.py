@@ -0,0 +1,111 @@
+import os
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+import matplotlib
+
+from stackplot import stackplot, Spectrogram
+from resample import resample, resample_chunks, align, Resampler
+
+os.makedirs('resample_test', exist_ok=True)
+
+# Methods; NaNs are ignored and a bin with no values is NaN
+t = np.array([0., 0.5, 1.2, 3.1, 3.2])
+y = np.array([1., np.nan, 3., 4., 5.])
+expected = {
+             'mean': [1, 3, np.nan, 4.5],
+             'min': [1, 3, np.nan, 4],
+             'max': [1, 3, np.nan, 5],
+             'last': [1, 3, np.nan, 5]
+           }
+for method, values in expected.items():
+  tr, yr = resample(t, y, 1., method=method)
+  print(f"t = {t}; y = {y}; method = '{method}' => t = {tr}; y = {yr}")
+  assert np.array_equal(tr, [0, 1, 2, 3])
+  assert np.array_equal(yr, values, equal_nan=True)
+
+# start and stop; values outside are dropped and bins are aligned to start
+tr, yr = resample(t, y, 1., start=0.5, stop=6)
+assert np.array_equal(tr, [0.5, 1.5, 2.5, 3.5, 4.5, 5.5])
+assert np.array_equal(yr, [3, np.nan, 4.5, np.nan, np.nan, np.nan], equal_nan=True)
+
+# datetime and datetime64 t; bins are exact multiples of the cadence
+t64 = np.datetime64('2000-01-01T00:00:01') + np.arange(10).astype('timedelta64[s]')
+tr, yr = resample(t64, np.arange(10.), timedelta(seconds=3))
+assert tr[0] == np.datetime64('2000-01-01T00:00:00') and len(tr) == 4
+assert np.array_equal(yr, [0.5, 3, 6, 8.5])
+tr2, yr2 = resample(list(t64.astype(datetime)), np.arange(10.), np.timedelta64(3, 's'))
+assert np.array_equal(tr, tr2) and np.array_equal(yr, yr2)
+
+# 2-D y with time along the first axis; 'last' is per column
+y2 = np.arange(20.).reshape(10, 2)
+y2[9, 1] = np.nan
+tr, yr = resample(t64, y2, timedelta(seconds=5), method='last')
+assert yr.shape == (3, 2) and np.array_equal(yr[1], [16, 17])
+assert np.array_equal(yr[2], [18, np.nan], equal_nan=True)
+
+# Chunks give the same result as one array
+rng = np.random.default_rng(0)
+t = np.sort(rng.uniform(0, 1000, 10000))
+y = rng.standard_normal((10000, 3))
+y[rng.random((10000, 3)) < 0.3] = np.nan
+for method in ['mean', 'min', 'max', 'last']:
+  tr, yr = resample(t, y, 7., method=method)
+  chunks = ((t[i:i + 333], y[i:i + 333]) for i in range(0, len(t), 333))
+  parts = list(resample_chunks(chunks, 7., method=method))
+  assert np.array_equal(tr, np.concatenate([p[0] for p in parts]))
+  assert np.allclose(yr, np.concatenate([p[1] for p in parts]), equal_nan=True)
+
+resampler = Resampler(1.)
+resampler.update([5., 6.], [1., 2.])
+try:
+  resampler.update([1.], [1.])
+  assert False
+except ValueError:
+  pass
+
+try:
+  resample(t, y, 1., method='median')
+  assert False
+except ValueError:
+  pass
+
+# align(); series with different cadences and ranges on one grid
+ta, ya = align([np.array([0., 0.5, 1.2, 3.1]), np.array([4.5, 5.])],
+               [np.array([1., 2., 3., 4.]), np.array([1., 2.])], 1.)
+print(f"align() => t = {ta}; y = {ya}")
+assert np.array_equal(ta, [0, 1, 2, 3, 4, 5])
+assert np.array_equal(ya[0], [1.5, 3, np.nan, 4, np.nan, np.nan], equal_nan=True)
+assert np.array_equal(ya[1], [np.nan]*4 + [1, 2], equal_nan=True)
+
+# stackplot(resample=...); 1-second, 1-minute, and hourly data on a 5-minute grid
+t1 = np.arange('2000-01-01', '2000-01-02', dtype='datetime64[s]')
+tm = t1[::60]
+th = t1[::3600]
+y1 = np.cumsum(rng.standard_normal(len(t1)))
+ym = np.cumsum(rng.standard_normal(len(tm)))
+yh = np.cumsum(rng.standard_normal(len(th)))
+z = rng.random((len(tm), 16))
+
+rcParams = {'figure.figsize': (8.5, 11), 'figure.dpi': 100,
+            'figure.constrained_layout.use': True}
+with matplotlib.rc_context(rc=rcParams):
+  start = time.perf_counter()
+  fig = stackplot([t1, tm, th, tm], [y1, ym, yh, Spectrogram(z)],
+                  title='1-second, 1-minute, hourly data; resample = 5 minutes',
+                  resample=timedelta(minutes=5), returnimage=True)
+  print(f'stackplot(resample=5 minutes): {time.perf_counter() - start:.2f} s')
+  fig.savefig('resample_test/resample_test_01.png')
+  print('Wrote resample_test/resample_test_01.png')
+  assert len(fig.axes[0].lines[0].get_xdata()) == 288
+  assert len(fig.axes[1].lines[0].get_xdata()) == 288
+  assert len(fig.axes[2].lines[0].get_xdata()) == 24
+
+  fig = stackplot(t1, [y1, [y1, -y1]], resample=(timedelta(minutes=10), 'max'),
+                  xlim=(datetime(2000, 1, 1, 6), datetime(2000, 1, 1, 12)),
+                  returnimage=True)
+  fig.savefig('resample_test/resample_test_02.png')
+  print('Wrote resample_test/resample_test_02.png')
+  x = fig.axes[0].lines[0].get_xdata()
+  assert 36 <= len(x) <= 38
@@ -0,0 +1,175 @@
+"""Pass arrays to worker processes in shared memory instead of pickling them
+
+Usage:
+  from shared import SharedArrays
+  with SharedArrays() as shared:
+    t_ref = shared.share(t)
+    y_ref = shared.share(y)
+    # Each job pickles only a descriptor of a window of the shared arrays.
+    jobs = [{'t': t_ref[lo:hi], 'y': y_ref[:, lo:hi], 'file': ...} for ...]
+    results = batch(jobs)
+
+or let batch() do this for the arrays in the jobs:
+  jobs = [{'t': t[lo:hi], 'y': y[:, lo:hi], 'file': ...} for ...]
+  results = batch(jobs, shared_memory=True)
+
+share(a) copies a into a multiprocessing.shared_memory block and returns a
+SharedArray, a descriptor (block name, dtype, shape, strides, and offset)
+that pickles to a few hundred bytes. Slicing a SharedArray with basic
+indices returns a descriptor of a view of the same block, and share() of a
+view of an array that is already shared returns a descriptor of a view of
+the block of that array, so jobs that plot different windows of the same
+archive use one copy of it. In a worker, SharedArray.array() attaches the
+block (once per process) and returns a read-only ndarray that uses it.
+
+Object arrays of datetimes are shared as datetime64[us]. The blocks are
+removed by SharedArrays.close() (or at the end of a with block), so workers
+must be done with them by then. A worker closes the blocks it attached when
+it exits, and close() closes those attached by the process that shares them.
+"""
+import os
+from multiprocessing import shared_memory, util
+
+import numpy as np
+
+class SharedArray:
+  """Descriptor of an ndarray in a shared memory block"""
+
+  def __init__(self, name, dtype, shape, strides, offset):
+    self.name = name
+    self.dtype = np.dtype(dtype).str
+    self.shape = tuple(shape)
+    self.strides = tuple(strides)
+    self.offset = offset
+
+  def __len__(self):
+    return self.shape[0]
+
+  def __repr__(self):
+    return f'SharedArray({self.name!r}, {self.dtype!r}, shape={self.shape}, offset={self.offset})'
+
+  def __getitem__(self, key):
+    """Descriptor of the view of the array given by basic indexing with key"""
+
+    # The view is computed on an array with the same shape and strides that
+    # does not own memory; only its shape, strides, and start are used.
+    itemsize = np.dtype(self.dtype).itemsize
+    dummy = np.lib.stride_tricks.as_strided(np.zeros(1, dtype=self.dtype),
+                                            shape=self.shape, strides=self.strides)
+    view = dummy[key]
+    if not isinstance(view, np.ndarray) or view.base is None:
+      raise ValueError('Only basic indexing (integers and slices) of a SharedArray is supported')
+    start = view.__array_interface__['data'][0] - dummy.__array_interface__['data'][0]
+    if start % itemsize != 0:
+      raise ValueError('Unaligned view of a SharedArray')
+    return SharedArray(self.name, self.dtype, view.shape, view.strides, self.offset + start)
+
+  def array(self):
+    """Read-only ndarray that uses the shared memory block"""
+    a = np.ndarray(self.shape, dtype=self.dtype, buffer=_attach(self.name).buf,
+                   offset=self.offset, strides=self.strides)
+    a.flags.writeable = False
+    return a
+
+class SharedArrays:
+  """Shared memory blocks created by this process"""
+
+  def __init__(self):
+    self.blocks = {}  # name => SharedMemory
+    self._shared = {} # id of shared array => (array, SharedArray)
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *args):
+    self.close()
+
+  def share(self, a):
+    """Return a SharedArray for a, copying a to a new block only if needed"""
+
+    a = np.asarray(a)
+
+    # If a is a view of a C-contiguous array, the base array is shared and a
+    # is a view of it.
+    base = a
+    while isinstance(base.base, np.ndarray):
+      base = base.base
+    if type(base) is not np.ndarray or not base.flags.c_contiguous or base.dtype != a.dtype or a.dtype == object:
+      base = a
+
+    if id(base) in self._shared and self._shared[id(base)][0] is base:
+      ref = self._shared[id(base)][1]
+    else:
+      data = np.ascontiguousarray(base)
+      if data.dtype == object:
+        data = data.astype('datetime64[us]')
+      if data.dtype.hasobject:
+        raise ValueError(f'Arrays of dtype {data.dtype} cannot be shared')
+      block = shared_memory.SharedMemory(create=True, size=max(data.nbytes, 1))
+      self.blocks[block.name] = block
+      np.ndarray(data.shape, dtype=data.dtype, buffer=block.buf)[...] = data
+      ref = SharedArray(block.name, data.dtype, data.shape, data.strides, 0)
+      # base is kept so that its id is not reused by another array.
+      self._shared[id(base)] = (base, ref)
+
+    if base is a:
+      return ref
+    start = a.__array_interface__['data'][0] - base.__array_interface__['data'][0]
+    return SharedArray(ref.name, a.dtype, a.shape, a.strides, start)
+
+  def share_all(self, x):
+    """x with each ndarray in x (or in nested lists and tuples) replaced by a SharedArray"""
+    if isinstance(x, np.ndarray):
+      try:
+        return self.share(x)
+      except (TypeError, ValueError):
+        return x # e.g., an object array of strings
+    if isinstance(x, (list, tuple)):
+      return type(x)(self.share_all(e) for e in x)
+    return x
+
+  def close(self):
+    """Close and remove all blocks"""
+    detach(self.blocks)
+    for block in self.blocks.values():
+      block.close()
+      block.unlink()
+    self.blocks = {}
+    self._shared = {}
+
+def resolve(x):
+  """x with each SharedArray in x (or in nested lists and tuples) replaced by its ndarray"""
+  if isinstance(x, SharedArray):
+    return x.array()
+  if isinstance(x, (list, tuple)):
+    return type(x)(resolve(e) for e in x)
+  return x
+
+_attached = {} # name => SharedMemory attached by this process
+_pid = None    # Process in which detach() is registered to run at exit
+
+def detach(names=None):
+  """Close the blocks (or the blocks in names) attached by this process
+
+  A block that is still used by an array from SharedArray.array() stays
+  open until the process exits.
+  """
+  for name in list(_attached if names is None else names):
+    if name not in _attached:
+      continue
+    try:
+      _attached[name].close()
+    except BufferError:
+      continue
+    del _attached[name]
+
+def _attach(name):
+  global _pid
+  if _pid != os.getpid():
+    # Finalizers run at exit of multiprocessing workers, which do not run
+    # atexit, and are not inherited by forked processes.
+    util.Finalize(None, detach, exitpriority=0)
+    _pid = os.getpid()
+  if name not in _attached:
+    _attached[name] = shared_memory.SharedMemory(name=name)
+  return _attached[name]
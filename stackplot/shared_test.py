@@ -0,0 +1,98 @@
+import os
+import pickle
+from datetime import datetime, timedelta
+from multiprocessing import shared_memory
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from shared import SharedArrays, SharedArray, resolve, detach, _attached
+from batch import batch
+
+def total(ref):
+  return float(np.nansum(ref.array()))
+
+def detached(ref):
+  """Number of blocks attached by a worker after it is done with ref"""
+  total(ref)
+  detach()
+  return len(_attached)
+
+if __name__ == '__main__':
+
+  os.makedirs('shared_test', exist_ok=True)
+
+  # Archive of 1-second data for 10 days; jobs plot 1-day windows of it.
+  t = np.arange('2000-01-01', '2000-01-11', dtype='datetime64[s]')
+  y = np.cumsum(np.random.randn(2, len(t)), axis=1)
+  day = 86400
+
+  with SharedArrays() as shared:
+    t_ref = shared.share(t)
+    y_ref = shared.share(y)
+    print(f'{t_ref}; {y_ref}')
+
+    # Views have the values of the same views of the arrays
+    w = y_ref[:, day:2*day]
+    assert w.name == y_ref.name
+    assert np.array_equal(w.array(), y[:, day:2*day])
+    assert np.array_equal(y_ref[1, ::-3].array(), y[1, ::-3])
+    assert not w.array().flags.writeable
+
+    # share() of views of a shared array does not copy
+    v = shared.share(y[:, 3*day:4*day])
+    assert v.name == y_ref.name and np.array_equal(v.array(), y[:, 3*day:4*day])
+    assert shared.share(t) is t_ref
+    assert len(shared.blocks) == 2
+
+    # Descriptors are small when pickled
+    n = len(pickle.dumps(w))
+    print(f'Pickled window: {n} bytes; pickled array: {len(pickle.dumps(y[:, day:2*day]))} bytes')
+    assert n < 500
+
+    try:
+      y_ref[[0, 1]]
+      assert False
+    except ValueError:
+      pass
+
+    # Object datetimes are shared as datetime64
+    to = np.array([datetime(2000, 1, 1) + timedelta(minutes=i) for i in range(10)])
+    assert np.array_equal(shared.share(to).array(), to.astype('datetime64[us]'))
+
+    # Nested lists and tuples
+    refs = shared.share_all([y[0], (y[1], 'x')])
+    assert isinstance(refs[0], SharedArray) and refs[1][1] == 'x'
+    assert np.array_equal(resolve(refs)[1][0], y[1])
+
+    # Workers attach the blocks
+    windows = [y_ref[:, k*day:(k + 1)*day] for k in range(10)]
+    with ProcessPoolExecutor(max_workers=2) as pool:
+      sums = list(pool.map(total, windows))
+    assert np.allclose(sums, [np.nansum(y[:, k*day:(k + 1)*day]) for k in range(10)])
+
+    # Workers close the blocks they attached
+    with ProcessPoolExecutor(max_workers=2) as pool:
+      assert list(pool.map(detached, windows[0:2])) == [0, 0]
+
+    name = y_ref.name
+
+  # Blocks are closed and removed on exit
+  assert name not in _attached
+  try:
+    shared_memory.SharedMemory(name=name)
+    assert False
+  except FileNotFoundError:
+    pass
+
+  # batch() with windows of one archive; each job pickles only descriptors.
+  jobs = []
+  for k in range(4):
+    jobs.append({'t': t[k*day:(k + 1)*day], 'y': y[:, k*day:(k + 1)*day],
+                 'title': f'Day {k}', 'decimate': 'minmax',
+                 'file': f'shared_test/shared_test_{k:02d}.png'})
+
+  for use_shm in [False, True]:
+    results = batch(jobs, workers=2, shared_memory=use_shm)
+    assert all(result['error'] is None for result in results), results
+  assert all(os.path.exists(job['file']) for job in jobs)
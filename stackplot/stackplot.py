@@ -1,13 +1,64 @@
+import io
+import logging
+import contextlib
 import datetime
 
 import numpy as np
 
-from matplotlib import pyplot as plt
-from matplotlib.ticker import MaxNLocator, MultipleLocator
-
-from datetick import datetick
-
-def stackplot(*args, title=None, style=None, max_gap=None):
+from timings import _stage, _LayoutTimer
+
+# Matplotlib, pyplot, and datetick are imported when first needed so that
+# importing this module is fast; see import_time_test.py.
+
+logger = logging.getLogger('stackplot')
+
+def stackplot(*args, title=None, style=None, max_gap=None,
+              decimate=None, max_points=None, returnimage=False, xlim=None,
+              timings=None, collection=None, resample=None):
+  """Plot time series in vertically stacked panels
+
+  If returnimage=False, the pyplot API is used and the figure is registered
+  with pyplot. Otherwise the Matplotlib OO API is used, which does not touch
+  pyplot state and so is thread safe. If returnimage=True, the Figure is
+  returned. If returnimage is a format string, e.g., 'png' or 'svg', the
+  figure is saved to bytes in that format and the bytes are returned.
+
+  If decimate='minmax', each trace with more than max_points values is
+  reduced to the minimum and maximum in each of max_points/2 time bins.
+  If decimate='lttb', each trace is reduced to max_points values using the
+  Largest-Triangle-Three-Buckets algorithm, which better preserves the shape
+  of smooth series. The default max_points is 2x the panel width in pixels.
+  decimate may also be set per panel or trace using a 'decimate' key in style.
+
+  If xlim = (start, stop), only the values with start <= t <= stop and one
+  value before and after are used; they are found with a binary search, so
+  t must be sorted. All other processing (gaps, decimation, y limits) uses
+  only these values.
+
+  If a panel has a list of traces, the traces are drawn as one LineCollection
+  instead of one Line2D per trace if collection=True, or if collection=None
+  and the panel has at least collection_min traces. This is much faster for
+  panels with many traces. It is not used for a panel if a trace has fewer
+  than 10 values (which are drawn with markers) or has a style key other
+  than those in collection_style_keys.
+
+  If resample = cadence or (cadence, method), each trace and Spectrogram is
+  first binned onto a regular time grid with resample.resample(), where
+  method is 'mean' (default), 'min', 'max', or 'last'. Bins are aligned to
+  multiples of cadence, so panels with different cadences are put on one
+  grid. Bins with no values are not plotted. With xlim, only the values in
+  xlim are binned.
+
+  If y[i] is a Spectrogram, panel i is an image of its 2-D (time x channel)
+  values with a colorbar; see Spectrogram. Time is binned so that there are
+  at most max_points columns (default: one per pixel of the panel width),
+  and time intervals longer than max_gap are masked.
+
+  If timings is a timings.Timings object, the time of each stage of
+  rendering is recorded in it; see timings.py. The number of values in each
+  panel and other details are logged to the 'stackplot' logger at DEBUG
+  level.
+  """
 
   if len(args) < 2:
     t = None
@@ -16,21 +67,84 @@ def stackplot(*args, title=None, style=None, max_gap=None):
     t = args[0]
     y = args[1]
 
-  t = _check_and_expand_t(t, y)
-  if not isinstance(y[0], list):
-    y = [y]
+  # Profile and trace memory if requested by timings.
+  with contextlib.nullcontext() if timings is None else timings.run():
+
+    fig, _, _ = _stackplot(t, y, title, style, max_gap, decimate, max_points,
+                           returnimage, xlim=xlim, timings=timings,
+                           collection=collection, resample=resample)
+
+    if isinstance(returnimage, str):
+      buf = io.BytesIO()
+      layout_timer = _LayoutTimer(fig, timings)
+      try:
+        with _stage(timings, 'save'):
+          fig.savefig(buf, format=returnimage)
+      finally:
+        layout_timer.remove()
+      return buf.getvalue()
+
+  return fig
+
+def _stackplot(t, y, title, style, max_gap, decimate, max_points, returnimage,
+               xlim=None, timings=None, collection=False, resample=None):
+  """Create figure; returns figure, axes, and lines
+
+  lines[i] is the Line2D for y[i] or, if y[i] is a list of traces, a list
+  with one Line2D per trace or the LineCollection with all traces (see
+  collection in stackplot()). If y[i] is a Spectrogram, lines[i] is its
+  QuadMesh.
+  """
+
+  with _stage(timings, 'normalize'):
+    y, spectrograms = _extract_spectrograms(y)
+    y = _check_and_expand_y(y)
+    t = _check_and_expand_t(t, y)
+    if not _is_list(y[0]):
+      y = [y]
   n_stack = len(y)
-  style = _check_and_expand_style(y, style, dict)
+  with _stage(timings, 'style'):
+    style = _check_and_expand_style(y, style, dict)
+
+  if resample is not None:
+    t, y, spectrograms = _resample_panels(t, y, spectrograms, resample, xlim, timings)
 
   if isinstance(title, list) and len(title) > 1 and len(title) != n_stack:
     raise ValueError(f'len(title) = {len(title)} != len(y) = {n_stack}')
 
-  plt.figure()
-  gs = plt.gcf().add_gridspec(n_stack)
+  _check_decimate(decimate)
+
+  if returnimage:
+    # See comments in timeseries() for why the OO API is not always used.
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg as FigureCanvas
+    fig = Figure()
+    # Attach canvas to fig, which is needed by datetick.
+    FigureCanvas(fig)
+  else:
+    from matplotlib import pyplot as plt
+    fig = plt.figure()
+
+  gs = fig.add_gridspec(n_stack)
   axes = gs.subplots(sharex=True)
   if n_stack == 1:
     axes = [axes]
 
+  layout_timer = _LayoutTimer(fig, timings)
+  try:
+    lines = _plot_panels(t, y, axes, title, style, max_gap, decimate,
+                         max_points, xlim, timings, collection, spectrograms)
+  finally:
+    layout_timer.remove()
+
+  return fig, axes, lines
+
+def _plot_panels(t, y, axes, title, style, max_gap, decimate, max_points,
+                 xlim, timings, collection, spectrograms):
+
+  n_stack = len(y)
+
+  lines = []
   for i in range(0, len(y)):
 
     if isinstance(title, list):
@@ -38,37 +152,434 @@ def stackplot(*args, title=None, style=None, max_gap=None):
     if isinstance(title, str) and i == 0:
       axes[i].set_title(title)
 
-    if isinstance(y[i][0], list):
-      print(f"  y[{i}] has {len(y[i])} list elements")
+    if i in spectrograms:
+      logger.debug('y[%d] is a %d x %d Spectrogram', i, *spectrograms[i].z.shape)
+      lines.append(_plot_spectrogram(t[i], spectrograms[i], axes[i], style[i], max_gap,
+                                     max_points, xlim, timings, i))
+    elif _is_list(y[i][0]) and _use_collection(y[i], style[i], collection):
+      logger.debug('y[%d] has %d list elements; using LineCollection', i, len(y[i]))
+      styles = []
       for j in range(0, len(y[i])):
         if 'label' not in style:
           style[i][j]['label'] = f'$y_{{{j}}}$'
-        _plot(t[i][j], y[i][j], axes[i], style[i][j], max_gap)
+        styles.append(style[i][j].copy())
+      lines.append(_plot_collection(t[i], y[i], axes[i], styles, max_gap, decimate,
+                                    max_points, xlim, timings, i))
+    elif _is_list(y[i][0]):
+      logger.debug('y[%d] has %d list elements', i, len(y[i]))
+      lines.append([])
+      for j in range(0, len(y[i])):
+        if 'label' not in style:
+          style[i][j]['label'] = f'$y_{{{j}}}$'
+        line = _plot(t[i][j], y[i][j], axes[i], style[i][j], max_gap, decimate,
+                     max_points, xlim, timings, i)
+        lines[i].append(line)
+      # _plot() set ylim from each trace; use the limits of all traces.
+      axes[i].set_autoscaley_on(True)
+      axes[i].autoscale_view(scalex=False)
+      _set_ylim(axes[i], axes[i].dataLim.y0)
       axes[i].legend()
     else:
-      print(f"  y[{i}] has {len(y[i])} values")
-      _plot(t[i], y[i], axes[i], style[i], max_gap)
+      logger.debug('y[%d] has %d values', i, len(y[i]))
+      line = _plot(t[i], y[i], axes[i], style[i], max_gap, decimate, max_points, xlim,
+                   timings, i)
+      lines.append(line)
       if 'label' in style[i]:
         axes[i].set_ylabel(style[i]['label'])
 
     if i == n_stack - 1:
-      datetick('x', axes=axes[i])
+      if xlim is not None:
+        axes[i].set_xlim(xlim)
+      with _stage(timings, 'ticks'):
+        _datetick(axes[i])
 
-  return plt.gcf()
+  return lines
 
-def _all_int(y):
+def _resample_panels(t, y, spectrograms, resample, xlim, timings):
+  """Resample each trace and Spectrogram; returns new t, y, and spectrograms"""
 
-  y = np.array(y)
-  Ig = ~np.isnan(y)
-  if np.all(np.equal(y[Ig], np.int32(y[Ig]))):
-    return True
+  import copy
+  from resample import resample as resample_trace
+
+  if isinstance(resample, tuple):
+    cadence, method = resample
   else:
+    cadence, method = resample, 'mean'
+
+  def _resample(ti, yi):
+    if xlim is not None:
+      ti, yi = _xlim_slice(ti, yi, xlim)
+    ti, yi = resample_trace(ti, yi, cadence, method=method)
+    # Bins with no values are dropped so that lines are broken only at gaps
+    # longer than max_gap.
+    empty = np.isnan(yi) if yi.ndim == 1 else np.all(np.isnan(yi), axis=1)
+    return ti[~empty], yi[~empty]
+
+  # t[i] may be the same object for all panels, and y and spectrograms
+  # may be the caller's; they are not modified.
+  t = list(t)
+  y = list(y)
+  spectrograms = spectrograms.copy()
+  for i in range(0, len(y)):
+    with _stage(timings, 'resample', i):
+      if i in spectrograms:
+        t[i], z = _resample(t[i], spectrograms[i].z)
+        spectrograms[i] = copy.copy(spectrograms[i])
+        spectrograms[i].z = z
+        y[i] = np.broadcast_to(np.nan, (len(t[i]),))
+      elif _is_list(y[i][0]):
+        t[i] = list(t[i])
+        y[i] = list(y[i])
+        for j in range(0, len(y[i])):
+          t[i][j], y[i][j] = _resample(t[i][j], y[i][j])
+      else:
+        t[i], y[i] = _resample(t[i], y[i])
+
+  return t, y, spectrograms
+
+collection_min = 10
+collection_style_keys = ['label', 'color', 'linewidth', 'linestyle', 'alpha', 'decimate']
+
+def _use_collection(y, style, collection):
+  """True if traces y with styles style can be drawn as a LineCollection"""
+  if collection is False:
+    return False
+  if collection is None and len(y) < collection_min:
     return False
+  for j in range(0, len(y)):
+    if len(y[j]) < 10:
+      return False
+    if any(key not in collection_style_keys for key in style[j]):
+      return False
+  return True
+
+def _plot_collection(t, y, axis, style, max_gap, decimate, max_points, xlim,
+                     timings, panel):
+  """Plot traces y[j] vs t[j] of one panel as one LineCollection
+
+  Limits are computed once for all traces.
+  """
+
+  import matplotlib
+  from matplotlib.collections import LineCollection
+  from matplotlib.colors import to_rgba
+  from matplotlib.lines import Line2D
+  from matplotlib.ticker import MaxNLocator
+
+  ts = []
+  ys = []
+  for j in range(0, len(y)):
+    decimate_j = style[j].get('decimate', decimate)
+    _check_decimate(decimate_j)
+    tj, yj, _ = _prepare(t[j], y[j], axis, max_gap, decimate_j,
+                         max_points, xlim, timings, panel)
+    ts.append(tj)
+    ys.append(np.asarray(yj, dtype=float))
+
+  with _stage(timings, 'plot', panel):
+    if all(len(tj) == len(ts[0]) for tj in ts):
+      # (n_traces, n_values, 2) array
+      segments = np.empty((len(ys), len(ts[0]), 2))
+      segments[:, :, 0] = ts
+      segments[:, :, 1] = ys
+    else:
+      segments = [np.column_stack((tj, yj)) for tj, yj in zip(ts, ys)]
+
+    cycle = matplotlib.rcParams['axes.prop_cycle'].by_key().get('color', ['C0'])
+    handles = []
+    for j in range(0, len(y)):
+      handles.append(Line2D([], [],
+                            color=style[j].get('color', cycle[j % len(cycle)]),
+                            linewidth=style[j].get('linewidth', matplotlib.rcParams['lines.linewidth']),
+                            linestyle=style[j].get('linestyle', '-'),
+                            alpha=style[j].get('alpha'),
+                            label=style[j].get('label')))
+
+    colors = [to_rgba(handle.get_color(), handle.get_alpha()) for handle in handles]
+    collection = LineCollection(segments, colors=colors,
+                                linewidths=[handle.get_linewidth() for handle in handles],
+                                linestyles=[handle.get_linestyle() for handle in handles])
+    axis.add_collection(collection, autolim=False)
+
+    # Data limits of all traces from one set of statistics per trace
+    stats = [_stats(yj) for yj in ys]
+    y_mins = [s['min'] for s in stats if not np.isnan(s['min'])]
+    y_maxs = [s['max'] for s in stats if not np.isnan(s['max'])]
+    y_min = min(y_mins) if len(y_mins) > 0 else np.nan
+    if len(y_mins) > 0:
+      t_min = min(tj[0] for tj in ts if len(tj) > 0)
+      t_max = max(tj[-1] for tj in ts if len(tj) > 0)
+      axis.update_datalim([(t_min, y_min), (t_max, max(y_maxs))])
+    axis.autoscale_view()
+
+    if all(s['all_int'] for s in stats):
+      axis.yaxis.set_major_locator(MaxNLocator(integer=True))
+    _set_ylim(axis, y_min)
+
+    if max_gap is not None:
+      for j in range(0, len(ys)):
+        _plot_end_markers(axis, ts[j], ys[j], handles[j], stats[j]['nan'])
+
+    axis.legend(handles=handles)
+
+  return collection
+
+class Spectrogram:
+  """2-D (time x channel) values of a panel drawn as one image
+
+  Usage:
+    fig = stackplot(t, [b, Spectrogram(flux, channels=energies, ylog=True,
+                                       clabel='Flux', norm='log')])
+
+  z[k, c] is the value at t[k] for channel c. channels are the channel
+  centers (len = z.shape[1]) or edges (len = z.shape[1] + 1); the default is
+  0, 1, ... . cmap, norm, vmin, and vmax are passed to pcolormesh(). If
+  ylog=True, the y-axis is logarithmic, channels must be positive, and the
+  channel edges computed from centers are geometric means.
+  """
+
+  def __init__(self, z, channels=None, cmap=None, norm=None, vmin=None,
+               vmax=None, clabel=None, ylog=False):
+
+    z = np.asarray(z)
+    if z.ndim != 2:
+      raise ValueError(f'z must be 2-D; z.ndim = {z.ndim}')
+    self.z = z
+    self.channels = channels
+    self.cmap = cmap
+    self.norm = norm
+    self.vmin = vmin
+    self.vmax = vmax
+    self.clabel = clabel
+    self.ylog = ylog
+    self.edges = self._channel_edges()
+
+  def __len__(self):
+    return self.z.shape[0]
+
+  def _channel_edges(self):
+
+    m = self.z.shape[1]
+    if self.channels is None:
+      c = np.arange(m, dtype=float)
+    else:
+      c = np.asarray(self.channels, dtype=float)
+    if len(c) != m and len(c) != m + 1:
+      raise ValueError(f'len(channels) = {len(c)} must be z.shape[1] = {m} or z.shape[1] + 1')
+    if self.ylog and np.any(c <= 0):
+      raise ValueError('channels must be positive if ylog=True')
+    if len(c) == m + 1:
+      return c
+    if m == 1:
+      return np.array([c[0] - 0.5, c[0] + 0.5]) if not self.ylog else np.array([c[0]/2, 2*c[0]])
+    if self.ylog:
+      c = np.log10(c)
+    mid = (c[:-1] + c[1:])/2
+    edges = np.concatenate(([c[0] - (mid[0] - c[0])], mid, [c[-1] + (c[-1] - mid[-1])]))
+    if self.ylog:
+      edges = 10**edges
+    return edges
+
+def _extract_spectrograms(y):
+  """Replace Spectrogram panels in y with 1-D placeholders of the same length
+
+  Returns y and a dict of panel index => Spectrogram. The placeholders are
+  read-only views of one NaN, so t and style are checked and expanded as for
+  a panel with one trace.
+  """
+
+  spectrograms = {}
+  if isinstance(y, Spectrogram):
+    spectrograms[0] = y
+    return np.broadcast_to(np.nan, (len(y),)), spectrograms
+
+  if isinstance(y, list) and any(isinstance(yi, Spectrogram) for yi in y):
+    y = y.copy()
+    for i in range(0, len(y)):
+      if isinstance(y[i], Spectrogram):
+        spectrograms[i] = y[i]
+        y[i] = np.broadcast_to(np.nan, (len(y[i]),))
+
+  return y, spectrograms
+
+def _plot_spectrogram(t, spectrogram, axis, style, max_gap, max_points, xlim,
+                      timings, panel):
+  """Plot a Spectrogram as one QuadMesh with a colorbar; returns the QuadMesh
 
-def _plot(t, y, axis, style, max_gap):
+  Time is binned to max_points columns (default: one per pixel of the panel
+  width), and time intervals longer than max_gap are masked.
+  """
 
+  z = spectrogram.z
+  if xlim is not None:
+    t, z = _xlim_slice(t, z, xlim)
+
+  if _is_date(t):
+    t = _t_to_float(t)
+    axis.xaxis.axis_date()
+    if max_gap is not None:
+      max_gap = _dt_to_float(max_gap, tol=True)
+  else:
+    t = np.asarray(t, dtype=float)
+
+  if max_points is None:
+    max_points = int(axis.bbox.width)
+
+  with _stage(timings, 'bin', panel):
+    edges, z = _spectrogram_grid(t, z, max_gap, max_points)
+  logger.debug('spectrogram: %d times => %d columns', len(t), z.shape[0])
+
+  with _stage(timings, 'plot', panel):
+    mesh = axis.pcolormesh(edges, spectrogram.edges, np.ma.masked_invalid(z.T),
+                           cmap=spectrogram.cmap, norm=spectrogram.norm,
+                           vmin=spectrogram.vmin, vmax=spectrogram.vmax,
+                           shading='flat')
+    if spectrogram.ylog:
+      axis.set_yscale('log')
+    # The colorbar is drawn outside of the axes so that the widths of all
+    # panels, and so their time axes, stay the same.
+    cax = axis.inset_axes([1.01, 0, 0.015, 1])
+    axis.figure.colorbar(mesh, cax=cax, label=spectrogram.clabel)
+    if 'label' in style:
+      axis.set_ylabel(style['label'])
+
+  return mesh
+
+def _spectrogram_grid(t, z, max_gap, n_bins):
+  """Column edges and values (one row per column) to draw z vs sorted float t
+
+  If len(t) > n_bins, z is averaged in n_bins equal-width time bins; a bin
+  with no values is masked (NaN) if it is in a gap longer than max_gap and
+  otherwise has the value of the bin before it. Otherwise, each value has a
+  column that extends halfway to the times before and after it, and a
+  masked column is inserted in each gap longer than max_gap.
+  """
+
+  z = np.asarray(z, dtype=float)
+  n = len(t)
+  if n == 0:
+    return np.array([0., 1.]), np.full((1, z.shape[1]), np.nan)
+
+  if n > n_bins > 0:
+    edges = np.linspace(t[0], t[-1], n_bins + 1)
+    b = np.clip(np.searchsorted(edges, t, side='right') - 1, 0, n_bins - 1)
+    starts = np.concatenate(([0], np.flatnonzero(np.diff(b)) + 1))
+    nan = np.isnan(z)
+    sums = np.add.reduceat(np.where(nan, 0., z), starts, axis=0)
+    counts = np.add.reduceat(~nan, starts, axis=0)
+    zb = np.full((n_bins, z.shape[1]), np.nan)
+    with np.errstate(invalid='ignore', divide='ignore'):
+      zb[b[starts]] = sums/counts
+
+    filled = np.zeros(n_bins, dtype=bool)
+    filled[b[starts]] = True
+    empty = np.flatnonzero(~filled)
+    if len(empty) > 0:
+      fill = np.ones(len(empty), dtype=bool)
+      if max_gap is not None:
+        centers = (edges[empty] + edges[empty + 1])/2
+        after = np.clip(np.searchsorted(t, centers), 1, n - 1)
+        fill = t[after] - t[after - 1] <= max_gap
+      # Index of the last filled bin at or before each bin; bin 0 has t[0].
+      before = np.maximum.accumulate(np.where(filled, np.arange(n_bins), 0))
+      zb[empty[fill]] = zb[before[empty[fill]]]
+    return edges, zb
+
+  dt = np.diff(t)
+  gap = np.zeros(len(dt), dtype=bool)
   if max_gap is not None:
-      t, y = _insert_nans(t, y, max_gap)
+    gap = dt > max_gap
+  if np.any(~gap):
+    dt_typical = np.median(dt[~gap])
+  else:
+    dt_typical = 1. if n == 1 else np.median(dt)
+  # Half of the distance to the next time; values next to a gap get a
+  # column with half of the typical spacing on the side of the gap.
+  half = np.where(gap, dt_typical/2, dt/2)
+  half = np.concatenate(([dt_typical/2 if n == 1 else half[0]], half,
+                         [dt_typical/2 if n == 1 else half[-1]]))
+  left = t - half[:-1]
+  right = t + half[1:]
+  edges = np.concatenate(([left[0]], right))
+  g = np.flatnonzero(gap)
+  edges = np.insert(edges, g + 2, left[g + 1])
+  z = np.insert(z, g + 1, np.nan, axis=0)
+  return edges, z
+
+def _spectrogram_grid_test():
+
+  t = np.array([0., 1., 2., 5., 6.])
+  z = np.arange(10.).reshape(5, 2)
+
+  edges, zg = _spectrogram_grid(t, z, 1.5, 100)
+  print(f"t = {t}; max_gap = 1.5 => edges = {edges}")
+  assert(np.array_equal(edges, [-0.5, 0.5, 1.5, 2.5, 4.5, 5.5, 6.5]))
+  assert(zg.shape == (6, 2) and np.all(np.isnan(zg[3])))
+  assert(np.array_equal(zg[4], z[3]))
+
+  edges, zg = _spectrogram_grid(t, z, None, 100)
+  assert(np.array_equal(edges, [-0.5, 0.5, 1.5, 3.5, 5.5, 6.5]))
+
+  # Binned; the bins in the gap are masked only if max_gap is given.
+  t = np.concatenate((np.arange(100.), 200 + np.arange(100.)))
+  z = np.ones((200, 3))
+  edges, zg = _spectrogram_grid(t, z, 1.5, 30)
+  assert(len(edges) == 31 and zg.shape == (30, 3))
+  assert(np.all(np.isnan(zg[12:18])) and not np.any(np.isnan(zg[0:10])))
+  assert(np.nanmax(zg) == 1 and np.nanmin(zg) == 1)
+  edges, zg = _spectrogram_grid(t, z, None, 30)
+  assert(not np.any(np.isnan(zg)))
+
+def _stats(y):
+  """Statistics of y used to set up a panel
+
+  Returns a dict with keys
+    'min', 'max': min and max of finite values (NaN if there are none),
+    'all_nan': True if all values are NaN,
+    'all_int': True if all values that are not NaN are integers,
+    'nan': boolean array that is True where y is NaN.
+  If y is 2-D, 'min', 'max', 'all_nan', and 'all_int' are arrays with one
+  element per column.
+  """
+
+  y = np.asarray(y)
+  if y.dtype.kind in 'biu':
+    y = y.astype(float)
+  if y.dtype.kind == 'f':
+    finite = np.isfinite(y)
+    nan = np.isnan(y)
+    # np.floor() does not overflow for large values, unlike a cast to int.
+    all_int = np.all((y == np.floor(y)) | nan, axis=0)
+  else:
+    # e.g., datetimes
+    nan = np.zeros(y.shape, dtype=bool)
+    return {'min': np.nan, 'max': np.nan, 'all_nan': False, 'all_int': False, 'nan': nan}
+
+  any_finite = np.any(finite, axis=0)
+  y_min = np.min(y, axis=0, where=finite, initial=np.inf)
+  y_max = np.max(y, axis=0, where=finite, initial=-np.inf)
+
+  return {
+          'min': np.where(any_finite, y_min, np.nan),
+          'max': np.where(any_finite, y_max, np.nan),
+          'all_nan': np.all(nan, axis=0) & (len(y) > 0),
+          'all_int': all_int,
+          'nan': nan
+        }
+
+def _check_decimate(decimate):
+  if decimate not in [None, 'minmax', 'lttb']:
+    raise ValueError(f"decimate = {decimate} must be None, 'minmax', or 'lttb'")
+
+def _plot(t, y, axis, style, max_gap, decimate=None, max_points=None, xlim=None,
+          timings=None, panel=None):
+
+  style = style.copy()
+  decimate = style.pop('decimate', decimate)
+  _check_decimate(decimate)
+
+  t, y, max_gap = _prepare(t, y, axis, max_gap, decimate, max_points, xlim,
+                           timings, panel)
 
   if len(t) == 1:
     if 'marker' not in style:
@@ -78,34 +589,107 @@ def _plot(t, y, axis, style, max_gap):
     if 'marker' not in style:
       style['marker'] = '.'
 
-  axis.plot(t, y, **style)
-  if _all_int(y):
-    axis.yaxis.set_major_locator(MaxNLocator(integer=True))
+  with _stage(timings, 'plot', panel):
+    line = axis.plot(t, y, **style)[0]
+
+    stats = _stats(y)
+    if stats['all_int']:
+      from matplotlib.ticker import MaxNLocator
+      axis.yaxis.set_major_locator(MaxNLocator(integer=True))
+
+    _set_ylim(axis, stats['min'])
+
+    line_marker = line.get_marker()
+    logger.debug('line_marker = %s', line_marker)
+    if max_gap is not None and line_marker == 'None':
+      _plot_end_markers(axis, t, y, line, stats['nan'])
+
+  return line
+
+def _prepare(t, y, axis, max_gap, decimate, max_points, xlim, timings=None, panel=None):
+  """Values of t and y to plot and max_gap in units of plotted t"""
+
+  if xlim is not None:
+    t, y = _xlim_slice(t, y, xlim)
+
+  if _is_date(t):
+    # Convert once to Matplotlib date numbers, which are used for gap
+    # detection, decimation, and plotting.
+    t = _t_to_float(t)
+    axis.xaxis.axis_date()
+    if max_gap is not None:
+      max_gap = _dt_to_float(max_gap, tol=True)
 
+  if max_gap is not None:
+    with _stage(timings, 'gaps', panel):
+      t, y = _insert_nans(t, y, max_gap)
+
+  if decimate is not None:
+    if max_points is None:
+      max_points = int(2*axis.bbox.width)
+    if len(t) > max_points:
+      n = len(t)
+      with _stage(timings, 'decimate', panel):
+        if decimate == 'minmax':
+          t, y = _decimate_minmax(t, y, max_points//2)
+        else:
+          t, y = _decimate_lttb(t, y, max_points)
+      logger.debug("decimate = '%s': kept %d of %d values", decimate, len(t), n)
+
+  return t, y, max_gap
+
+def _datetick(axis, dir='x'):
+  """datetick(dir, axes=axis), imported on first use
+
+  datetick calls matplotlib.pyplot.setp() without importing pyplot, so
+  pyplot is imported first; this does not register figures.
+  """
+  import matplotlib.pyplot
+  from datetick import datetick
+  datetick(dir, axes=axis)
+
+def _set_ylim(axis, y_min, y_max=None):
+  """Set ylim to the first and last major tick
+
+  If y_max is given, the view is first autoscaled to y values in
+  [y_min, y_max], as for a new plot of values with this range.
+  """
+  if y_max is not None:
+    axis.dataLim.intervaly = (y_min, y_max)
+    axis.set_autoscaley_on(True)
+    axis.autoscale_view(scalex=False)
   yticks = axis.get_yticks()
   ylim_max = yticks[-1] # Force tick label above last y value.
   ylim_min = yticks[0]
-  if ylim_min < 0 and min(y) >= 0:
+  if ylim_min < 0 and y_min >= 0:
     ylim_min = 0 # Prevent gap below 0 if no y values are negative.
   axis.set_ylim(ylim_min, ylim_max)
 
-  line = axis.lines[0]
-  line_marker = line.get_marker()
+def _plot_end_markers(axis, t, y, line, nan):
+  """Plot markers at values that are isolated by a NaN; returns the Line2Ds
+
+  nan is a boolean array that is True where y is NaN.
+  """
+
+  markers = []
   line_width = line.get_linewidth()
-  print(f"  line_marker = {line_marker}")
-  if max_gap is not None and line_marker == 'None':
-    line_width = line.get_linewidth()
-    if len(y) > 3:
-      line_style = {
-                      "marker": '.',
-                      "markersize": 1.5*line_width,
-                      "color": line.get_color()
-                  }
-      # If second or second to last value is NaN, plot a marker at that point.
-      if np.isnan(y[-2]):
-        axis.plot(t[-1], y[-1], **line_style)
-      if np.isnan(y[1]):
-        axis.plot(t[0], y[0], **line_style)
+  if len(y) > 3:
+    line_style = {
+                    "marker": '.',
+                    "markersize": 1.5*line_width,
+                    "color": line.get_color()
+                }
+    # If second or second to last value is NaN, plot a marker at that point.
+    if nan[-2]:
+      markers.extend(axis.plot(t[-1], y[-1], **line_style))
+    if nan[1]:
+      markers.extend(axis.plot(t[0], y[0], **line_style))
+
+  return markers
+
+def _is_list(x):
+  """True if x is a list or an ndarray with at least one dimension"""
+  return isinstance(x, list) or (isinstance(x, np.ndarray) and x.ndim > 0)
 
 def _check_type(y, _type):
 
@@ -147,11 +731,11 @@ def _check_and_expand_style(y, style, inner):
       raise ValueError(f'len(style) = {len(style)} != len(y) = {len(y)}')
 
   for i in range(0, len(y)):
-    if isinstance(style[i], inner) and isinstance(y[i][0], list):
+    if isinstance(style[i], inner) and _is_list(y[i][0]):
       # y = [[list, list], ...]
       # style = [dict, ...]
       style[i] = [style[i]]*len(y[i])
-    if len(style[i]) == 1 and len(y[i]) > 1:
+    if isinstance(style[i], list) and len(style[i]) == 1 and len(y[i]) > 1:
       # y = [[list, list], ...]
       # style = [[dict], ...]
       style[i] = _check_and_expand_style(y[i], style[i][0], inner)
@@ -218,20 +802,38 @@ def _check_and_expand_style_test():
   print(f"y = {y3}; style = {so} => {s}")
   assert(s == [[{}, {}], {}])
 
-def _check_and_expand_t(t, y):
+def _check_and_expand_y(y):
+  """Split 2-D ndarrays in y into lists of 1-D row views
+
+  No data are copied; 1-D ndarrays are kept as-is. A 2-D y is treated as
+  [row, row, ...], i.e., one panel per row. A 2-D element y[i] is treated as
+  [row, row, ...], i.e., one trace per row in panel i.
+  """
 
-  if isinstance(t, np.ndarray):
-    t = t.tolist()
   if isinstance(y, np.ndarray):
-    y = y.tolist()
-  if isinstance(y[0], np.ndarray):
-    for i in range(0, len(y)):
-      if isinstance(y[i], np.ndarray):
-        y[i] = y[i].tolist()
+    if y.ndim == 0:
+      return y.item()
+    if y.ndim == 1:
+      return y
+    return list(y)
+
+  if isinstance(y, list):
+    if any(isinstance(yi, np.ndarray) and yi.ndim > 1 for yi in y):
+      y = y.copy()
+      for i in range(0, len(y)):
+        if isinstance(y[i], np.ndarray) and y[i].ndim > 1:
+          y[i] = list(y[i])
+
+  return y
+
+def _check_and_expand_t(t, y):
+
+  t = _check_and_expand_y(t)
+  y = _check_and_expand_y(y)
 
   # y = [list, list, ...]
-  if isinstance(y[0], list):
-    _ret = _check_type(y, list)
+  if _is_list(y[0]):
+    _ret = _check_type(y, (list, np.ndarray))
     if _ret is not True:
       raise ValueError(f'If y[0] is a list, all elements of y must be lists. Element y[{_ret}] is not a list.')
 
@@ -239,44 +841,45 @@ def _check_and_expand_t(t, y):
     t = []
     for i in range(0, len(y)):
       t.append([])
-      if isinstance(y[i][0], list):
+      if _is_list(y[i][0]):
         for j in range(0, len(y[i])):
           #import pdb; pdb.set_trace()
-          t[i].append(list(range(1, 1 + len(y[i][j]))))
+          t[i].append(_range(y[i][j]))
       else:
-        t[i] = list(range(1, 1 + len(y[i])))
+        t[i] = _range(y[i])
     return t
 
-  if not isinstance(t[0], list):
-    if not isinstance(y[0], list):
+  if not _is_list(t[0]):
+    if not _is_list(y[0]):
       if len(t) != len(y):
         raise ValueError(f'len(t) = {len(t)} != len(y) = {len(y)}')
-    if isinstance(y[0], list) and len(t) != len(y[0]):
+    if _is_list(y[0]) and len(t) != len(y[0]):
         raise ValueError(f'len(t) = {len(t)} != len(y[0]) = {len(y[0])}')
 
-  if isinstance(t[0], list) and not isinstance(y[0], list):
+  if _is_list(t[0]) and not _is_list(y[0]):
     raise ValueError('If t[0] is a list, y[0] must be a list.')
 
-  if not isinstance(y[0], list):
+  if not _is_list(y[0]):
     y = [y]
-  if not isinstance(t[0], list):
+  if not _is_list(t[0]):
     t = [t]
-  if isinstance(t[0][0], list) and len(t[0]) == 1:
+  if _is_list(t[0][0]) and len(t[0]) == 1:
     t[0] = t[0][0]
 
-  if not isinstance(t[0][0], list) and not isinstance(y[0][0], list):
+  if not _is_list(t[0][0]) and not _is_list(y[0][0]):
     if len(t[0]) != len(y[0]):
       raise ValueError(f'len(t[0]) = {len(t[0])} != len(y[0]) = {len(y[0])}')
 
   if len(t) == 1 and len(y) > 1:
     # y = [list, list, ...]
     # t = [list] => t = [[list], [list], ...]
+    # All elements of t refer to the same object; no copies are made.
     t = t*len(y)
     for i in range(0, len(y)):
-      if len(t[i]) != len(y[i]):
-        raise ValueError(f'Cannot use same t for all y: len(t[0]) = {len(t[0])} != len(y[{i}]) = {len(y[i])}')
-      if isinstance(y[i][0], list):
+      if _is_list(y[i][0]):
         t[i] = _check_and_expand_t([t[i]], y[i])
+      elif len(t[i]) != len(y[i]):
+        raise ValueError(f'Cannot use same t for all y: len(t[0]) = {len(t[0])} != len(y[{i}]) = {len(y[i])}')
     return t
 
   if len(t) != len(y):
@@ -288,18 +891,18 @@ def _check_and_expand_t(t, y):
     #print(t[i])
     #print(y[i])
 
-    if isinstance(t[i], list) and isinstance(t[i][0], list) and len(t[i]) > 1:
-      if isinstance(y[i], list):
+    if _is_list(t[i]) and _is_list(t[i][0]) and len(t[i]) > 1:
+      if _is_list(y[i]):
         if len(t[i]) != len(y[i]):
           raise ValueError(f'len(t[{i}]) = {len(t[i])} != len(y[{i}]) = {len(y[i])}')
 
-      if not isinstance(y[i][0], list):
+      if not _is_list(y[i][0]):
         raise ValueError(f't[{i}] is a list but y[{i}][0] is not')
 
-    if isinstance(t[i][0], list) and len(t[0]) == 1:
+    if _is_list(t[i][0]) and len(t[0]) == 1:
       t[i] = t[i][0]
 
-    if isinstance(y[i][0], list):
+    if _is_list(y[i][0]):
       t[i] = _check_and_expand_t([t[i]], y[i])
     else:
       if len(t[i]) != len(y[i]):
@@ -307,6 +910,12 @@ def _check_and_expand_t(t, y):
 
   return t
 
+def _range(y):
+  """Default t for y; a list for list y and an ndarray for ndarray y"""
+  if isinstance(y, np.ndarray):
+    return np.arange(1, 1 + len(y))
+  return list(range(1, 1 + len(y)))
+
 def _check_and_expand_t_test():
 
   y0 = [1, 2]
@@ -334,7 +943,7 @@ def _check_and_expand_t_test():
   to = None
   t = _check_and_expand_t(np.array(to), np.array(y1))
   print(f"y = {y1}; t = {to} => {t}")
-  assert(t == [[1, 2]])
+  assert(np.array_equal(t, [[1, 2]]))
 
   to = None
   t = _check_and_expand_t(to, y1)
@@ -467,22 +1076,370 @@ def _check_and_expand_t_test():
     print(f"y = {y2}; t = {to} => {e}")
     assert(e.args[0] == "Cannot use same t for all y: len(t[0]) = 2 != len(y[1]) = 3")
 
+  # ndarrays are not copied and panels share the same t object
+  to = np.arange('2000-01-01', '2000-01-03', dtype='datetime64[D]')
+  ya = np.array([[1., 2.], [3., 4.]])
+  t = _check_and_expand_t(to, ya)
+  print(f"y = {ya.tolist()}; t = {to} => {t}")
+  assert(t[0] is to and t[1] is to)
+
+  y = _check_and_expand_y(ya)
+  assert(np.shares_memory(y[0], ya) and np.shares_memory(y[1], ya))
+
+  ya = [np.array([[1., 2.], [3., 4.]]), np.array([5., 6.])]
+  t = _check_and_expand_t(to, ya)
+  print(f"y = {[a.tolist() for a in ya]}; t = {to} => {t}")
+  assert(t[0][0] is to and t[0][1] is to and t[1] is to)
+
 def _insert_nans(t, y, dt_min):
-  """Insert NaNs in time series where time difference is greater than dt_min"""
-  _t = []
-  _y = []
-  for i in range(0, len(t) - 1):
-    dt = t[i+1] - t[i]
-    _t.append(t[i])
-    _y.append(y[i])
-    if dt > dt_min:
-      _t.append(t[i+1] - datetime.timedelta(microseconds=1))
-      _y.append(np.nan)
-  _t.append(t[-1])
-  _y.append(y[-1])
-
-  return _t, _y
+  """Insert NaNs in time series where time difference is greater than dt_min
+
+  t may be numeric, datetime64, or datetime. y may be 1-D with len(y) = len(t)
+  or 2-D with one row per trace, i.e., y.shape = (n_traces, len(t)). The time
+  of each inserted NaN is 1 microsecond before the time after the gap (for
+  numeric t, the midpoint of the gap).
+  """
+  t = np.asarray(t)
+  y = np.asarray(y)
+  if len(t) < 2:
+    return t, y
+
+  dt = np.diff(t)
+  gap = np.flatnonzero(dt > dt_min) + 1
+  if len(gap) == 0:
+    return t, y
+
+  if np.issubdtype(t.dtype, np.number):
+    t = t.astype(float, copy=False)
+    t_nan = t[gap] - dt[gap - 1]/2
+  elif np.issubdtype(t.dtype, np.datetime64):
+    t_nan = t[gap] - np.timedelta64(1, 'us')
+  else:
+    t_nan = t[gap] - datetime.timedelta(microseconds=1)
+
+  if y.dtype.kind in 'biu':
+    y = y.astype(float)
+
+  return np.insert(t, gap, t_nan), np.insert(y, gap, np.nan, axis=-1)
+
+def _insert_nans_test():
+
+  dt = datetime.timedelta(seconds=1)
+  t0 = datetime.datetime(2000, 1, 1)
+  t = [t0, t0 + dt, t0 + 3*dt, t0 + 4*dt, t0 + 7*dt]
+  y = [0, 1, 3, 4, 7]
+
+  ti, yi = _insert_nans(t, y, dt)
+  print(f"t = {t}; y = {y} => t = {ti}, y = {yi}")
+  assert(np.array_equal(yi, [0, 1, np.nan, 3, 4, np.nan, 7], equal_nan=True))
+  assert(ti[2] == t[2] - datetime.timedelta(microseconds=1))
+  assert(ti[5] == t[4] - datetime.timedelta(microseconds=1))
+
+  t64 = np.array(t, dtype='datetime64[us]')
+  ti, yi = _insert_nans(t64, y, dt)
+  assert(np.array_equal(yi, [0, 1, np.nan, 3, 4, np.nan, 7], equal_nan=True))
+  assert(ti[2] == t64[2] - np.timedelta64(1, 'us'))
+
+  tn = [0, 1, 3, 4, 7]
+  ti, yi = _insert_nans(tn, y, 1)
+  assert(np.array_equal(ti, [0, 1, 2, 3, 4, 5.5, 7]))
+
+  # 2-D y with one row per trace
+  y2 = np.array([y, y])
+  ti, yi = _insert_nans(tn, y2, 1)
+  assert(yi.shape == (2, 7))
+  assert(np.array_equal(yi[1], [0, 1, np.nan, 3, 4, np.nan, 7], equal_nan=True))
+
+  # No gaps
+  ti, yi = _insert_nans(tn, y, 10)
+  assert(np.array_equal(ti, tn) and np.array_equal(yi, y))
+
+def _stats_test():
+
+  y = [1., np.nan, 3., 2**40, -np.inf]
+  stats = _stats(y)
+  print(f"y = {y} => all_int = {stats['all_int']}; min = {stats['min']}; max = {stats['max']}")
+  assert(stats['all_int'] and stats['min'] == 1 and stats['max'] == 2**40)
+  assert(not stats['all_nan'] and np.array_equal(stats['nan'], np.isnan(y)))
+
+  # Cast to int32 overflows for 3e9 + 0.5
+  assert(not _stats([3e9 + 0.5, 1])['all_int'])
+
+  stats = _stats([np.nan, np.nan])
+  assert(stats['all_nan'] and np.isnan(stats['min']) and np.isnan(stats['max']))
+
+  stats = _stats(np.array([[1, 2], [3, 4]]))
+  assert(np.array_equal(stats['min'], [1, 2]) and np.all(stats['all_int']))
+
+  stats = _stats(np.array([[1., np.nan], [3.5, np.nan]]))
+  assert(np.array_equal(stats['all_nan'], [False, True]))
+  assert(np.array_equal(stats['all_int'], [False, True]))
+
+  stats = _stats([])
+  assert(not stats['all_nan'] and np.isnan(stats['min']))
+
+def _xlim_slice(t, y, xlim):
+  """Values of sorted t in [xlim[0], xlim[1]] and one value before and after"""
+  t = np.asarray(t)
+  lo = np.searchsorted(t, _as_type(xlim[0], t), side='left')
+  hi = np.searchsorted(t, _as_type(xlim[1], t), side='right')
+  lo = max(lo - 1, 0)
+  hi = min(hi + 1, len(t))
+  return t[lo:hi], np.asarray(y)[lo:hi]
+
+def _as_type(value, t):
+  """Convert value to a scalar that can be compared with elements of t"""
+  if np.issubdtype(t.dtype, np.datetime64):
+    return np.datetime64(value).astype(t.dtype)
+  if t.dtype == object and isinstance(value, np.datetime64):
+    return value.astype('datetime64[us]').item()
+  return value
+
+def _xlim_slice_test():
+
+  t = np.arange('2000-01-01', '2000-01-11', dtype='datetime64[D]')
+  y = np.arange(10)
+
+  ts, ys = _xlim_slice(t, y, (datetime.datetime(2000, 1, 3), np.datetime64('2000-01-05T12')))
+  print(f"t = {t}; xlim = (2000-01-03, 2000-01-05T12) => t = {ts}")
+  assert(np.array_equal(ys, [1, 2, 3, 4, 5]))
+
+  ts, ys = _xlim_slice(t.astype('datetime64[us]').astype(object), list(y), (np.datetime64('2000-01-03'), datetime.datetime(2000, 1, 5)))
+  assert(np.array_equal(ys, [1, 2, 3, 4, 5]))
+
+  ts, ys = _xlim_slice(np.arange(10.), y, (-5, 0))
+  assert(np.array_equal(ys, [0, 1]))
+
+  ts, ys = _xlim_slice(np.arange(10.), y, (20, 30))
+  assert(np.array_equal(ys, [9]))
+
+def _is_date(t):
+  """True if t is a datetime64 array or a sequence of datetimes"""
+  t = np.asarray(t)
+  if np.issubdtype(t.dtype, np.datetime64):
+    return True
+  return t.dtype == object and len(t) > 0 and isinstance(t[0], datetime.date)
+
+def _dt_to_float(dt, tol=False):
+  """Convert timedelta or timedelta64 to days (the unit of _t_to_float(t))
+
+  If tol=True, 1 microsecond is added so that differences of date numbers,
+  which have rounding errors of ~0.1 microsecond, that equal dt are <= dt.
+  """
+  if isinstance(dt, datetime.timedelta):
+    dt = dt.total_seconds()/86400.
+  elif isinstance(dt, np.timedelta64):
+    dt = dt/np.timedelta64(1, 'D')
+  if tol:
+    dt = dt + 1e-6/86400.
+  return dt
+
+def _t_to_float(t):
+  """Convert numeric, datetime64, or datetime t to a float ndarray
+
+  datetime64 and datetime values are converted to Matplotlib date numbers
+  (days since Matplotlib's epoch).
+  """
+  t = np.asarray(t)
+  if np.issubdtype(t.dtype, np.number):
+    return t.astype(float, copy=False)
+  from matplotlib import dates as mdates
+  return mdates.date2num(t)
+
+def _decimate_minmax(t, y, n_bins):
+  """Keep the min and max of y in each of n_bins equal-width time bins
+
+  NaNs (e.g., from _insert_nans) are kept, one per bin, so that line breaks
+  at gaps are preserved. The returned values are a time-ordered subset of
+  the input values.
+  """
+  t = np.asarray(t)
+  y = np.asarray(y)
+  if len(t) <= 2*n_bins:
+    return t, y
+
+  tf = _t_to_float(t)
+  edges = np.linspace(tf[0], tf[-1], n_bins + 1)
+  b = np.clip(np.searchsorted(edges, tf, side='right') - 1, 0, n_bins - 1)
+
+  # Bins are contiguous runs because t is sorted. Label each value with its run.
+  new = np.diff(b) != 0
+  starts = np.concatenate(([0], np.flatnonzero(new) + 1))
+  run = np.concatenate(([0], np.cumsum(new)))
+
+  nan = np.isnan(y)
+  keep = []
+  for fill, reduce in [(np.inf, np.minimum), (-np.inf, np.maximum)]:
+    yf = np.where(nan, fill, y)
+    extreme = reduce.reduceat(yf, starts)
+    Ie = np.flatnonzero((yf == extreme[run]) & ~nan)
+    # First index in each run at which the extreme occurs
+    _, first = np.unique(run[Ie], return_index=True)
+    keep.append(Ie[first])
+
+  In = np.flatnonzero(nan)
+  _, first = np.unique(run[In], return_index=True)
+  keep.append(In[first])
+
+  keep = np.unique(np.concatenate(keep))
+  return t[keep], y[keep]
+
+def _decimate_minmax_test():
+
+  t = np.arange(1000.)
+  y = np.sin(t/50.)
+  y[500] = 10 # Spike
+  y[700:710] = np.nan
+
+  td, yd = _decimate_minmax(t, y, 50)
+  print(f"len(t) = {len(t)} => len(td) = {len(td)}")
+  assert(len(td) <= 3*50)
+  assert(np.all(np.diff(td) > 0))
+  assert(np.nanmax(yd) == 10 and np.nanmin(yd) == np.nanmin(y))
+  assert(np.any(np.isnan(yd)))
+  assert(np.all(np.isnan(yd) == np.isnan(y[td.astype(int)])))
+
+  t64 = np.arange(0, 1000, dtype='datetime64[s]')
+  td, yd = _decimate_minmax(t64, y, 50)
+  assert(td.dtype == t64.dtype and len(td) <= 3*50)
+
+  # Fewer values than 2*n_bins are not decimated
+  td, yd = _decimate_minmax(t[0:10], y[0:10], 50)
+  assert(len(td) == 10)
+
+def _lttb(x, y, n):
+  """Indices of n values of (x, y) selected by Largest-Triangle-Three-Buckets
+
+  x and y must not contain NaNs. The first and last values are always kept.
+  Each of the n - 2 buckets in between contributes the value that forms the
+  largest triangle with the previously selected value and the mean of the
+  next bucket. See Steinarsson, S., Downsampling Time Series for Visual
+  Representation, 2013.
+  """
+  N = len(x)
+  if n >= N:
+    return np.arange(N)
+  if n < 3:
+    return np.array([0, N - 1])
+
+  # Bucket i spans edges[i]:edges[i+1]; each has at least one value.
+  edges = np.linspace(1, N - 1, n - 1).astype(int)
+  counts = np.diff(edges)
+  x_mean = np.add.reduceat(x[0:N-1], edges[0:-1])/counts
+  y_mean = np.add.reduceat(y[0:N-1], edges[0:-1])/counts
+  x_mean = np.append(x_mean[1:], x[-1])
+  y_mean = np.append(y_mean[1:], y[-1])
+
+  idx = np.empty(n, dtype=int)
+  idx[0] = 0
+  idx[-1] = N - 1
+  a = 0
+  for i in range(0, n - 2):
+    lo, hi = edges[i], edges[i+1]
+    area = np.abs((x[a] - x_mean[i])*(y[lo:hi] - y[a])
+                  - (x[a] - x[lo:hi])*(y_mean[i] - y[a]))
+    a = lo + np.argmax(area)
+    idx[i+1] = a
+
+  return idx
+
+def _decimate_lttb(t, y, n):
+  """Reduce (t, y) to about n values using LTTB
+
+  Each run of non-NaN values (e.g., separated by NaNs from _insert_nans) that
+  spans at least three buckets of len(t)/n values is reduced separately and
+  is allocated a share of n proportional to its length, so that buckets never
+  span a gap. The values between these runs (shorter runs and NaNs) are
+  grouped into buckets of two, and each group keeps its first NaN and the
+  value farthest from its mean, so many gaps do not increase the number of
+  values kept.
+  """
+  t = np.asarray(t)
+  y = np.asarray(y)
+  if len(t) <= n:
+    return t, y
+
+  tf = _t_to_float(t)
+  nan = np.isnan(y)
+  n_finite = len(y) - np.count_nonzero(nan)
+  bounds = np.concatenate(([0], np.flatnonzero(np.diff(nan)) + 1, [len(y)]))
+  starts, ends = bounds[0:-1], bounds[1:]
+
+  # Number of values per kept value
+  per = max(n_finite, 1)/n
+  m = np.round((ends - starts)/per).astype(int)
+  long = ~nan[starts] & (m >= 3)
+
+  keep = []
+  for s, e, mi in zip(starts[long], ends[long], m[long]):
+    keep.append(s + _lttb(tf[s:e], y[s:e], mi))
+
+  # Group the other values by the number of non-NaN values before them.
+  # Groups do not span a long run because it has more than 2*per values.
+  Is = np.flatnonzero(np.repeat(~long, ends - starts))
+  if len(Is) > 0:
+    k = ((np.cumsum(~nan) - ~nan)[Is]/(2*per)).astype(int)
+
+    In = Is[nan[Is]]
+    _, first = np.unique(k[nan[Is]], return_index=True)
+    keep.append(In[first])
+
+    If = Is[~nan[Is]]
+    if len(If) > 0:
+      kf = k[~nan[Is]]
+      new = np.diff(kf) != 0
+      gs = np.concatenate(([0], np.flatnonzero(new) + 1))
+      group = np.concatenate(([0], np.cumsum(new)))
+      yf = y[If]
+      mean = np.add.reduceat(yf, gs)/np.diff(np.append(gs, len(yf)))
+      dev = np.abs(yf - mean[group])
+      Id = np.flatnonzero(dev == np.maximum.reduceat(dev, gs)[group])
+      _, first = np.unique(group[Id], return_index=True)
+      keep.append(If[Id[first]])
+
+  keep = np.unique(np.concatenate(keep))
+  return t[keep], y[keep]
+
+def _decimate_lttb_test():
+
+  t = np.arange(1000.)
+  y = np.sin(t/50.)
+
+  idx = _lttb(t, y, 100)
+  print(f"len(t) = {len(t)} => len(idx) = {len(idx)}")
+  assert(len(idx) == 100 and idx[0] == 0 and idx[-1] == 999)
+  assert(np.all(np.diff(idx) > 0))
+
+  y[700:710] = np.nan
+  td, yd = _decimate_lttb(t, y, 100)
+  assert(abs(len(td) - 100) < 5)
+  assert(np.all(np.diff(td) > 0))
+  # Only one NaN for the gap and no values selected inside of it.
+  assert(np.count_nonzero(np.isnan(yd)) == 1)
+  assert(np.all(np.isnan(yd) == np.isnan(y[td.astype(int)])))
+
+  td, yd = _decimate_lttb(t[0:10], y[0:10], 100)
+  assert(len(td) == 10)
+
+  # Many gaps do not increase the number of values kept
+  t = np.arange(1000000.)
+  y = np.sin(t/5000.)
+  for n_gaps in [10, 1000, 100000]:
+    yg = y.copy()
+    yg[np.linspace(0, len(t) - 1, n_gaps + 2).astype(int)[1:-1]] = np.nan
+    td, yd = _decimate_lttb(t, yg, 1600)
+    print(f"{n_gaps} gaps: len(t) = {len(t)} => len(td) = {len(td)}")
+    assert(len(td) <= 2*1600)
+    assert(np.all(np.diff(td) > 0))
+    assert(np.all(np.isnan(yd) == np.isnan(yg[td.astype(int)])))
+    assert(np.any(np.isnan(yd)))
 
 if __name__ == '__main__':
   #_check_and_expand_style_test()
   _check_and_expand_t_test()
+  _insert_nans_test()
+  _decimate_minmax_test()
+  _decimate_lttb_test()
+  _xlim_slice_test()
+  _stats_test()
+  _spectrogram_grid_test()
@@ -1,4 +1,5 @@
-from hapiclient import hapi, hapitime2datetime
+from hapi_cache import hapi_cached
+from hapi_chunks import hapi_arrays
 from stackplot import stackplot
 import matplotlib
 
@@ -46,8 +47,11 @@ parameters = 'BX_GSE,BY_GSM,BZ_GSM,Vx,Vy,Vz,SYM_H'
 start      = '2024-05-10T00:00:00Z'
 stop       = '2024-05-15T00:00:00.000Z'
 
-data, meta = hapi(server, dataset, parameters, start, stop)
-time = hapitime2datetime(data['Time'])
+# Request each day in parallel; days already requested are read from disk.
+time, data, meta, timing = hapi_arrays(server, dataset, parameters, start, stop,
+                                       fetch=hapi_cached)
+for info in timing:
+  print(f"{info['start']} to {info['stop']}: {info['n']} records in {info['time']:.2f} s")
 tn = 1
 with matplotlib.rc_context(rc=rcParams):
   fig = stackplot(time, [data['BZ_GSM'], data['SYM_H']])
@@ -1,3 +1,4 @@
+import time
 import matplotlib
 from matplotlib import pyplot as plt
 from datetime import datetime, timedelta
@@ -146,3 +147,113 @@ _rcParams['figure.constrained_layout.h_pad'] = 0.4
 _rcParams['figure.constrained_layout.w_pad'] = 0.4
 title = "h_pad = 0.40 in, hspace = 0.10, w_pad = 0.40 in"
 plot(11, list(t1), [list(y1), list(y1+1)], title, [s1, s2], None, _rcParams)
+
+# ndarrays are used as-is (not converted to lists)
+t3 = np.array(t1, dtype='datetime64[us]')
+y3 = np.vstack((y1, y1+1))
+title = "t = ndarray of datetime64 and y = 2-D ndarray"
+plot(12, t3, y3, title, s1, None, rcParams)
+
+# Decimation
+t4 = np.arange('2000-01-01', '2000-01-08', dtype='datetime64[s]')
+y4 = np.sin(2*np.pi*np.arange(len(t4))/86400.) + 0.1*np.random.randn(len(t4))
+y4[300000] = 5 # Spike should be visible
+t4 = np.delete(t4, slice(400000, 420000))
+y4 = np.delete(y4, slice(400000, 420000))
+title = "t = 1-second datetime64 w/gap, decimate = 'minmax'"
+with matplotlib.rc_context(rc=rcParams):
+  fig = stackplot(t4, [y4, [y4, -y4]], title=title, style=s1,
+                  max_gap=timedelta(seconds=1), decimate='minmax')
+  if save:
+    fig.savefig("stackplot_test/stackplot_test_13.png")
+    print("Wrote stackplot_test/stackplot_test_13.png")
+
+title = "decimate = 'minmax' (top) and style = {'decimate': 'lttb'} (bottom)"
+with matplotlib.rc_context(rc=rcParams):
+  fig = stackplot(t4, [y4, y4], title=title, style=[s1, {**s1, 'decimate': 'lttb'}],
+                  max_gap=timedelta(seconds=1), decimate='minmax')
+  if save:
+    fig.savefig("stackplot_test/stackplot_test_14.png")
+    print("Wrote stackplot_test/stackplot_test_14.png")
+
+# Thread safe rendering (returnimage != False does not use pyplot)
+from concurrent.futures import ThreadPoolExecutor
+fignums = plt.get_fignums()
+with ThreadPoolExecutor(max_workers=4) as pool:
+  args = [(t3, y3 + k) for k in range(8)]
+  images = list(pool.map(lambda a: stackplot(*a, title="Thread", returnimage='png'), args))
+assert all(image.startswith(b'\x89PNG') for image in images)
+assert plt.get_fignums() == fignums
+if save:
+  with open("stackplot_test/stackplot_test_15.png", "wb") as f:
+    f.write(images[-1])
+  print("Wrote stackplot_test/stackplot_test_15.png")
+
+# xlim; only the data in xlim are processed
+title = "t = 1-second datetime64, xlim = (2000-01-04, 2000-01-05), decimate = 'minmax'"
+with matplotlib.rc_context(rc=rcParams):
+  fig = stackplot(t4, [y4, y4], title=title, style=s1, max_gap=timedelta(seconds=1),
+                  decimate='minmax', xlim=(datetime(2000, 1, 4), datetime(2000, 1, 5)))
+  if save:
+    fig.savefig("stackplot_test/stackplot_test_16.png")
+    print("Wrote stackplot_test/stackplot_test_16.png")
+
+# Panel with many traces drawn as one LineCollection
+t17 = np.arange('2000-01-01', '2000-01-02', dtype='datetime64[m]')
+y17 = np.cumsum(np.random.randn(30, len(t17)), axis=1) + 10*np.arange(30)[:, None]
+y17[:, 600:700] = np.nan
+title = "30 traces in one panel; collection=None (LineCollection) and collection=False (Line2Ds)"
+with matplotlib.rc_context(rc=rcParams):
+  times = []
+  figs = []
+  for k, collection in enumerate([None, False]):
+    start = time.perf_counter()
+    fig = stackplot(t17, [y17[0], list(y17)], title=title, max_gap=timedelta(minutes=1),
+                    collection=collection, returnimage=True)
+    fig.canvas.draw()
+    times.append(time.perf_counter() - start)
+    figs.append(fig)
+    if save:
+      fig.savefig(f"stackplot_test/stackplot_test_17{'ab'[k]}.png")
+      print(f"Wrote stackplot_test/stackplot_test_17{'ab'[k]}.png")
+  print(f"LineCollection: {times[0]:.2f} s; Line2Ds: {times[1]:.2f} s")
+
+  from matplotlib.collections import LineCollection
+  axis_c, axis_l = figs[0].axes[1], figs[1].axes[1]
+  assert len(axis_c.collections) == 1 and isinstance(axis_c.collections[0], LineCollection)
+  assert len(axis_c.lines) == 0
+  assert len(axis_l.collections) == 0 and len(axis_l.lines) >= 30
+  # Same legend and y-limits as the Line2Ds
+  handles_c = axis_c.get_legend().legend_handles
+  handles_l = axis_l.get_legend().legend_handles
+  assert [h.get_label() for h in handles_c] == [h.get_label() for h in handles_l]
+  assert [h.get_color() for h in handles_c] == [h.get_color() for h in handles_l]
+  assert axis_c.get_ylim() == axis_l.get_ylim()
+
+  # decimate in style is checked for traces drawn as a LineCollection
+  try:
+    stackplot(t17, [y17[0], list(y17)], style=[{}, {'decimate': 'bogus'}], returnimage=True)
+    assert False
+  except ValueError:
+    pass
+
+# Spectrogram panel below line panels; 2-D (time x channel) values drawn as
+# one image with time binned to pixel resolution and the gap masked.
+from stackplot import Spectrogram
+t18 = np.arange('2000-01-01', '2000-01-02', dtype='datetime64[s]')
+t18 = np.delete(t18, slice(40000, 45000))
+energies = np.logspace(1, 4, 32)
+z18 = np.exp(-np.log(energies/(1000 + 500*np.sin(2*np.pi*np.arange(len(t18))/86400.)[:, None]))**2)
+z18 = z18*(1 + 0.1*np.random.rand(len(t18), len(energies)))
+title = "Spectrogram panel; 1-second data w/gap binned to pixel resolution"
+with matplotlib.rc_context(rc=rcParams):
+  fig = stackplot(t18, [z18[:, 16], Spectrogram(z18, channels=energies, ylog=True, clabel='Flux')],
+                  title=title, style=[{'label': 'Channel 16'}, {'label': 'Energy [eV]'}],
+                  max_gap=timedelta(seconds=1), returnimage=True)
+  mesh = fig.axes[1].collections[0]
+  assert mesh.get_array().shape[0] == len(energies)
+  assert mesh.get_array().shape[1] <= fig.axes[1].bbox.width
+  assert np.ma.count_masked(mesh.get_array()) > 0
+  if save:
+    fig.savefig("stackplot_test/stackplot_test_18.png")
+    print("Wrote stackplot_test/stackplot_test_18.png")
@@ -2,20 +2,19 @@ import datetime
 import warnings
 
 import numpy as np
-import matplotlib
 
-from datetick import datetick
-
-# https://github.com/pandas-dev/pandas/issues/18301
-# Suppresses depreciation warning.
-# TODO: determine what version of pandas this is needed for.
-# Observed in Matplotlib 3.0, pandas 0.25.3, Python 3.5.
-from pandas.plotting import register_matplotlib_converters
-register_matplotlib_converters()
+from stackplot import _stats, _datetick
 
 def timeseries(t, y, **kwargs):
     """Plot a time series"""
 
+    # Imported here instead of at module level so that importing this module
+    # is fast. Importing matplotlib.dates registers Matplotlib's converters
+    # for datetime and datetime64, so pandas' register_matplotlib_converters()
+    # is not needed.
+    import matplotlib
+    import matplotlib.dates
+
     opts = {
                 'logging': False,
                 'title': '',
@@ -27,7 +26,8 @@ def timeseries(t, y, **kwargs):
                 'backend': 'default',
                 'returnimage': False,
                 'transparent': False,
-                'legendlabels': []
+                'legendlabels': [],
+                'maxcategories': 20
             }
 
     for key, value in kwargs.items():
@@ -72,6 +72,12 @@ def timeseries(t, y, **kwargs):
 
     t = np.array(t)
 
+    # Convert datetimes once to Matplotlib date numbers (vectorized for
+    # datetime64 and naive datetimes) instead of in each plot call.
+    t_is_date = np.issubdtype(t.dtype, np.datetime64) or isinstance(t[0], datetime.datetime)
+    if t_is_date:
+        t = matplotlib.dates.date2num(t)
+
     if y.shape[0] != t.shape[0]:
         if len(y.shape) > 1:
             if y.shape[1] == t.shape[0]:
@@ -91,20 +97,8 @@ def timeseries(t, y, **kwargs):
     if issubclass(y.dtype.type, np.flexible):
         # See https://docs.scipy.org/doc/numpy-1.13.0/reference/arrays.scalars.html
         # for diagram of subclasses.
-        # Find unique strings and give each an integer value.
-        # Modify tick labels to correspond to unique strings
-        yu = np.unique(y)
-        if len(yu) > 20:
-            # Too many labels in this case. One option is to find
-            # number of unique first characters and change labels to
-            # "first character" and then warn. If number of unique first
-            # characters < 21, try number of unique second characters, etc.
-            raise ValueError('Can only plot strings if number of unique strings < 21')
-        yi = np.zeros((y.shape))
-        for i in range(0, len(yu)):
-            yi[y == yu[i]] = i
-        ylabels = yu
-        y = yi
+        # Give each unique string an integer value; tick labels are the strings.
+        y, ylabels = categories(y, opts['maxcategories'])
 
 
     # Can't use matplotlib.style.use(style) because not thread safe.
@@ -120,19 +114,11 @@ def timeseries(t, y, **kwargs):
     else:
         fig, ax = plt.subplots()
 
-    if len(y.shape) > 1:
-        all_nan = np.full((y.shape[1]), False)
-        for i in range(0, y.shape[1]):
-            try:
-                all_nan[i] = np.all(np.isnan(y[:,i]))
-            except:
-                all_nan[i] = False
-    else:
-        all_nan = np.array([False])
-        try:
-            all_nan[0] = np.all(np.isnan(y))
-        except:
-            all_nan[0] = False
+    if t_is_date:
+        ax.xaxis.axis_date()
+
+    # One pass over y for all columns; all_nan is False for non-float y.
+    all_nan = np.atleast_1d(_stats(y)['all_nan'])
 
     legendlabels = opts['legendlabels'].copy()
     if legendlabels == []:
@@ -173,16 +159,15 @@ def timeseries(t, y, **kwargs):
     if len(y) == 1:
         ax.set_yticks(y)
 
-    if np.any(all_nan):
+    if np.all(all_nan):
         if len(y.shape) > 1:
             for i in range(0, y.shape[1]):
-                if all_nan[i]:
-                    ax.plot([t[0],t[-1]],[0,0], alpha=0)
-                else:
-                    ax.plot(t, y[:,i])
+                ax.plot([t[0],t[-1]],[0,0], alpha=0)
         else:
             ax.plot([t[0],t[-1]],[0,0], linestyle=None, alpha=0)
     else:
+        # One call for all columns; columns that are all NaN draw nothing
+        # but have a Line2D for the legend.
         ax.plot(t, y, **props)
 
     ax.set(ylabel=opts['ylabel'], xlabel=opts['xlabel'], title=opts['title'])
@@ -206,14 +191,22 @@ def timeseries(t, y, **kwargs):
         ax.grid()
 
     if not np.all(all_nan) and len(ylabels) > 0:
-        ax.set_yticks(np.unique(y))
-        ax.set_yticklabels(ylabels)
-
-
-    if isinstance(t[0], datetime.datetime):
-        datetick('x', axes=ax)
+        # Label every step-th category if all labels do not fit. The last
+        # label, which may be the "other" category, is always shown.
+        step = _label_step(ax, len(ylabels))
+        ticks = np.arange(0, len(ylabels), step)
+        if ticks[-1] != len(ylabels) - 1:
+            ticks[-1] = len(ylabels) - 1
+        ax.set_yticks(ticks)
+        ax.set_yticklabels(ylabels[ticks])
+        if step > 1:
+            ax.set_yticks(np.arange(0, len(ylabels)), minor=True)
+
+
+    if t_is_date:
+        _datetick(ax)
     if isinstance(y[0], datetime.datetime):
-        datetick('y', axes=ax)
+        _datetick(ax, 'y')
 
     # savefig.transparent=True requires the following for the saved image
     # to have a transparent background. Seems as though figure.facealpha
@@ -229,6 +222,43 @@ def timeseries(t, y, **kwargs):
 
     return fig
 
+def categories(y, maxcategories=20):
+    """Integer codes (as floats) for the strings in y and the label for each code
+
+    Codes are in sorted order of the strings. If maxcategories is not None and
+    there are more than maxcategories unique strings, the maxcategories - 1
+    most frequent are kept and the others are given the code of a last label
+    of "other" (or "other 2", "other 3", ... if y has a string "other").
+    """
+
+    labels, codes = np.unique(y, return_inverse=True)
+    codes = codes.reshape(y.shape)
+
+    if maxcategories is not None and len(labels) > maxcategories:
+        counts = np.bincount(codes.ravel(), minlength=len(labels))
+        # Stable sort so that ties are kept in sorted order of the strings.
+        keep = np.sort(np.argsort(-counts, kind='stable')[0:maxcategories - 1])
+        code_map = np.full(len(labels), len(keep))
+        code_map[keep] = np.arange(len(keep))
+        codes = code_map[codes]
+        other = 'other'
+        n = 1
+        while other in labels:
+            n += 1
+            other = 'other {0:d}'.format(n)
+        labels = np.append(labels[keep].astype(str), other)
+
+    return codes.astype(float), labels
+
+def _label_step(ax, n):
+    """Smallest step such that n/step tick labels fit on the y-axis of ax"""
+    from matplotlib.font_manager import FontProperties
+    import matplotlib
+    size = FontProperties(size=matplotlib.rcParams['ytick.labelsize']).get_size_in_points()
+    height = ax.get_window_extent().height*72./ax.figure.dpi # points
+    n_fit = max(1, int(height/(1.5*size)))
+    return max(1, int(np.ceil(n/n_fit)))
+
 def adjust_labels(ax):
     # Not used. See
     # https://stackoverflow.com/questions/24581194/matplotlib-text-bounding-box-dimensions
@@ -0,0 +1,152 @@
+"""Per-stage timing, profiling, and memory tracing for stackplot()
+
+Usage:
+  from timings import Timings
+  timings = Timings()
+  fig = stackplot(t, y, timings=timings)
+  print(timings.report())
+  timings.total('gaps')      # Seconds for gap insertion in all panels
+  timings.panel_totals()     # {panel index: seconds}
+
+Stages are
+  normalize  checking and expanding t and y
+  style      checking and expanding style
+  resample   resample.resample() of each trace (one record per panel)
+  gaps       max_gap NaN insertion (one record per trace)
+  decimate   decimation (one record per trace)
+  bin        time binning of a Spectrogram panel
+  plot       Axes.plot(), ylim, and end-of-segment markers (one record per trace)
+  ticks      datetick()
+  layout     layout engine, e.g., constrained_layout (includes the draws done
+             by datetick() and savefig())
+  save       savefig() when returnimage is a format string (includes layout)
+
+Each stage is also logged to the 'stackplot' logger at DEBUG level, and if
+callback is given, it is called as callback(stage, seconds, panel) after each
+stage, where panel is None for stages that are not for one panel.
+
+Timings(profile=True) runs cProfile during stackplot(); the result is a
+pstats.Stats in Timings.profile. Timings(trace_memory=True) uses tracemalloc
+to record the peak memory allocated in each stage (in bytes), which slows
+execution.
+"""
+import time
+import logging
+import contextlib
+
+logger = logging.getLogger('stackplot')
+
+class Timings:
+
+  def __init__(self, callback=None, profile=False, trace_memory=False):
+    self.callback = callback
+    self.trace_memory = trace_memory
+    self.records = []
+    self.profile = None
+    self._profile = profile
+
+  @contextlib.contextmanager
+  def run(self):
+    """Enable profiling and memory tracing, if requested, for one call"""
+
+    import tracemalloc
+    profiler = None
+    if self._profile:
+      import cProfile
+      profiler = cProfile.Profile()
+      profiler.enable()
+    started = False
+    if self.trace_memory and not tracemalloc.is_tracing():
+      tracemalloc.start()
+      started = True
+    try:
+      yield self
+    finally:
+      if started:
+        tracemalloc.stop()
+      if profiler is not None:
+        import pstats
+        profiler.disable()
+        if self.profile is None:
+          self.profile = pstats.Stats(profiler)
+        else:
+          self.profile.add(profiler)
+
+  @contextlib.contextmanager
+  def stage(self, name, panel=None):
+    """Time the enclosed code and record it as stage name"""
+
+    import tracemalloc
+    tracing = self.trace_memory and tracemalloc.is_tracing()
+    if tracing:
+      tracemalloc.reset_peak()
+      memory_start = tracemalloc.get_traced_memory()[0]
+    start = time.perf_counter()
+    try:
+      yield
+    finally:
+      seconds = time.perf_counter() - start
+      record = {'stage': name, 'panel': panel, 'time': seconds}
+      if tracing:
+        record['peak'] = tracemalloc.get_traced_memory()[1] - memory_start
+      self.records.append(record)
+      if panel is None:
+        logger.debug('%s: %.4f s', name, seconds)
+      else:
+        logger.debug('%s: panel %d: %.4f s', name, panel, seconds)
+      if self.callback is not None:
+        self.callback(name, seconds, panel)
+
+  def total(self, name):
+    """Total time in seconds of all records for stage name"""
+    return sum(record['time'] for record in self.records if record['stage'] == name)
+
+  def totals(self):
+    """Dict of stage name => total time in seconds, in order of first record"""
+    totals = {}
+    for record in self.records:
+      totals[record['stage']] = totals.get(record['stage'], 0.) + record['time']
+    return totals
+
+  def panel_totals(self):
+    """Dict of panel index => total time in seconds of stages for that panel"""
+    totals = {}
+    for record in self.records:
+      if record['panel'] is not None:
+        totals[record['panel']] = totals.get(record['panel'], 0.) + record['time']
+    return totals
+
+  def report(self):
+    """Table of total time per stage and per panel"""
+    lines = [f'{name:>10s} {1000*seconds:10.2f} ms' for name, seconds in self.totals().items()]
+    for panel, seconds in self.panel_totals().items():
+      lines.append(f'{"panel " + str(panel):>10s} {1000*seconds:10.2f} ms')
+    return '\n'.join(lines)
+
+def _stage(timings, name, panel=None):
+  """timings.stage(name, panel) or a context that does nothing if timings is None"""
+  if timings is None:
+    return contextlib.nullcontext()
+  return timings.stage(name, panel)
+
+class _LayoutTimer:
+  """Record time spent in a figure's layout engine as stage 'layout'"""
+
+  def __init__(self, fig, timings):
+    self.engine = None
+    if timings is None:
+      return
+    engine = fig.get_layout_engine()
+    if engine is None or not hasattr(engine, 'execute'):
+      return
+    self.engine = engine
+    execute = engine.execute
+    def timed_execute(fig):
+      with timings.stage('layout'):
+        return execute(fig)
+    # The instance attribute is used instead of the class method.
+    engine.execute = timed_execute
+
+  def remove(self):
+    if self.engine is not None:
+      del self.engine.execute
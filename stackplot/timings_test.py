@@ -0,0 +1,52 @@
+import logging
+from datetime import timedelta
+
+import numpy as np
+import matplotlib
+
+from stackplot import stackplot
+from timings import Timings
+
+t = np.arange('2000-01-01', '2000-01-03', dtype='datetime64[s]')[::10]
+y = np.cumsum(np.random.randn(3, len(t)), axis=1)
+y[1][1000:1100] = np.nan
+
+calls = []
+def callback(stage, seconds, panel):
+  calls.append((stage, panel))
+
+rcParams = {'figure.constrained_layout.use': True}
+with matplotlib.rc_context(rc=rcParams):
+  timings = Timings(callback=callback)
+  png = stackplot(t, [y[0], y[1], [y[2], y[2] + 1]], max_gap=timedelta(minutes=1),
+                  decimate='minmax', returnimage='png', timings=timings)
+print(timings.report())
+
+totals = timings.totals()
+for stage in ['normalize', 'style', 'gaps', 'decimate', 'plot', 'ticks', 'layout', 'save']:
+  assert stage in totals, stage
+assert set(timings.panel_totals().keys()) == {0, 1, 2}
+# One plot record per trace
+assert [panel for stage, panel in calls if stage == 'plot'] == [0, 1, 2, 2]
+assert len(calls) == len(timings.records)
+
+# Logging
+records = []
+class Handler(logging.Handler):
+  def emit(self, record):
+    records.append(record.getMessage())
+logger = logging.getLogger('stackplot')
+logger.addHandler(Handler())
+logger.setLevel(logging.DEBUG)
+stackplot(t, y, returnimage=True)
+assert 'y[0] has 17280 values' in records
+logger.setLevel(logging.WARNING)
+
+# Profile and memory
+timings = Timings(profile=True, trace_memory=True)
+stackplot(t, y, max_gap=timedelta(minutes=1), returnimage='png', timings=timings)
+assert timings.profile is not None and timings.profile.total_calls > 0
+gaps = [record for record in timings.records if record['stage'] == 'gaps']
+assert len(gaps) == 3 and all(record['peak'] > 0 for record in gaps)
+
+print('timings_test.py passed')